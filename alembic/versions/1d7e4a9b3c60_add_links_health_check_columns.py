@@ -0,0 +1,40 @@
+"""add links health check columns
+
+Revision ID: 1d7e4a9b3c60
+Revises: e5a1c9d3f7b2
+Create Date: 2026-10-17 22:40:03.771560
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d7e4a9b3c60'
+down_revision: Union[str, Sequence[str], None] = 'e5a1c9d3f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('links', sa.Column('http_status', sa.Integer(), nullable=True))
+    op.add_column('links', sa.Column('final_url', sa.String(), nullable=True))
+    op.add_column('links', sa.Column('favicon_url', sa.String(), nullable=True))
+    op.add_column('links', sa.Column('og_title', sa.String(), nullable=True))
+    op.add_column('links', sa.Column('check_error', sa.String(), nullable=True))
+    op.add_column('links', sa.Column('checked_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_links_checked_at'), 'links', ['checked_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_links_checked_at'), table_name='links')
+    op.drop_column('links', 'checked_at')
+    op.drop_column('links', 'check_error')
+    op.drop_column('links', 'og_title')
+    op.drop_column('links', 'favicon_url')
+    op.drop_column('links', 'final_url')
+    op.drop_column('links', 'http_status')
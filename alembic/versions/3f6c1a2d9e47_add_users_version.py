@@ -0,0 +1,28 @@
+"""add users version
+
+Revision ID: 3f6c1a2d9e47
+Revises: b01a59a8994b
+Create Date: 2026-10-17 09:12:44.201837
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c1a2d9e47'
+down_revision: Union[str, Sequence[str], None] = 'b01a59a8994b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'version')
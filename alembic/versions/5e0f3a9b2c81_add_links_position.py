@@ -0,0 +1,32 @@
+"""add links position
+
+Revision ID: 5e0f3a9b2c81
+Revises: d4b91e0c7a36
+Create Date: 2026-10-17 13:41:27.064518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0f3a9b2c81'
+down_revision: Union[str, Sequence[str], None] = 'd4b91e0c7a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('links', sa.Column('position', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_links_user_id_position_id', 'links', ['user_id', 'position', 'id'], unique=False)
+    op.drop_index('ix_links_user_id_id', table_name='links')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_links_user_id_id', 'links', ['user_id', 'id'], unique=False)
+    op.drop_index('ix_links_user_id_position_id', table_name='links')
+    op.drop_column('links', 'position')
@@ -0,0 +1,37 @@
+"""add search indexes
+
+Revision ID: 6b1d3f8a2c57
+Revises: 9c4a2e7f1b38
+Create Date: 2026-10-17 18:22:41.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1d3f8a2c57'
+down_revision: Union[str, Sequence[str], None] = '9c4a2e7f1b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_users_username_trgm', 'users', ['username'], unique=False,
+        postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_links_title_tsv', 'links', [sa.text("to_tsvector('simple', coalesce(title, ''))")], unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_links_title_tsv', table_name='links')
+    op.drop_index('ix_users_username_trgm', table_name='users')
@@ -0,0 +1,29 @@
+"""drop jobs data column
+
+Revision ID: 7f2c5b9e4a13
+Revises: 1d7e4a9b3c60
+Create Date: 2026-10-18 10:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2c5b9e4a13'
+down_revision: Union[str, Sequence[str], None] = '1d7e4a9b3c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Uploads are staged on disk now; the job payload holds their path
+    op.drop_column('jobs', 'data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('jobs', sa.Column('data', sa.LargeBinary(), nullable=True))
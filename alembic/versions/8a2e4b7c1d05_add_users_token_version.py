@@ -0,0 +1,28 @@
+"""add users token_version
+
+Revision ID: 8a2e4b7c1d05
+Revises: 3f6c1a2d9e47
+Create Date: 2026-10-17 10:03:18.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2e4b7c1d05'
+down_revision: Union[str, Sequence[str], None] = '3f6c1a2d9e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
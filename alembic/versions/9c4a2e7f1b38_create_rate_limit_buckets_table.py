@@ -0,0 +1,37 @@
+"""create rate_limit_buckets table
+
+Revision ID: 9c4a2e7f1b38
+Revises: f2b7d94e6a13
+Create Date: 2026-10-17 17:48:30.276145
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4a2e7f1b38'
+down_revision: Union[str, Sequence[str], None] = 'f2b7d94e6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated', sa.Float(), nullable=False),
+        sa.Column('allowed', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_rate_limit_buckets_updated'), 'rate_limit_buckets', ['updated'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_rate_limit_buckets_updated'), table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,28 @@
+"""add users avatar_variants
+
+Revision ID: a7d2c6e81f94
+Revises: 5e0f3a9b2c81
+Create Date: 2026-10-17 15:02:51.337120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2c6e81f94'
+down_revision: Union[str, Sequence[str], None] = '5e0f3a9b2c81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('avatar_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'avatar_variants')
@@ -0,0 +1,35 @@
+"""create link_clicks table
+
+Revision ID: c3e8f1a6b5d2
+Revises: a7d2c6e81f94
+Create Date: 2026-10-17 16:20:44.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f1a6b5d2'
+down_revision: Union[str, Sequence[str], None] = 'a7d2c6e81f94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'link_clicks',
+        sa.Column('link_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['link_id'], ['links.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('link_id', 'hour')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('link_clicks')
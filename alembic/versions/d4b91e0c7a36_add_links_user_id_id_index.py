@@ -0,0 +1,28 @@
+"""add links (user_id, id) index
+
+Revision ID: d4b91e0c7a36
+Revises: 8a2e4b7c1d05
+Create Date: 2026-10-17 11:20:05.913364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b91e0c7a36'
+down_revision: Union[str, Sequence[str], None] = '8a2e4b7c1d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_links_user_id_id', 'links', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_links_user_id_id', table_name='links')
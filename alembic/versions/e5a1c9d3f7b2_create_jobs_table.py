@@ -0,0 +1,52 @@
+"""create jobs table
+
+Revision ID: e5a1c9d3f7b2
+Revises: 6b1d3f8a2c57
+Create Date: 2026-10-17 21:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c9d3f7b2'
+down_revision: Union[str, Sequence[str], None] = '6b1d3f8a2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), server_default='queued', nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_type_status_run_at', 'jobs', ['type', 'status', 'run_at'], unique=False)
+    op.create_index(op.f('ix_jobs_user_id'), 'jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_jobs_finished_at'), 'jobs', ['finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_jobs_finished_at'), table_name='jobs')
+    op.drop_index(op.f('ix_jobs_user_id'), table_name='jobs')
+    op.drop_index('ix_jobs_type_status_run_at', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,36 @@
+"""create profile_view_rollups table
+
+Revision ID: f2b7d94e6a13
+Revises: c3e8f1a6b5d2
+Create Date: 2026-10-17 17:05:12.804116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d94e6a13'
+down_revision: Union[str, Sequence[str], None] = 'c3e8f1a6b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'profile_view_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('views', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('sketch', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('profile_view_rollups')
@@ -1,32 +1,199 @@
-from datetime import datetime, timedelta
-from jose import JWTError, jwt, ExpiredSignatureError
-from passlib.context import CryptContext
-from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from .config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_MAX_ENTRIES,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+)
+from .cache import TTLCache
+from .instrumentation import record_bcrypt
+from .metrics import registry
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib and python-jose are imported on first use: public reads never need
+# them, and together they add ~65ms to a cold start
+@lru_cache(maxsize=None)
+def password_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def jwt_module():
+    from jose import jwt
+    return jwt
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
+
+
+class InvalidToken(Exception):
+    """Bad signature, malformed token or missing claims."""
+
+
+class TokenExpired(InvalidToken):
+    pass
+
+
+# === Password hashing pool ===
+password_hash_seconds = registry.histogram(
+    "password_hash_duration_seconds", "Time spent in one bcrypt hash/verify"
+)
+password_hash_wait_seconds = registry.histogram(
+    "password_hash_queue_seconds", "Time a bcrypt call waited for a worker thread"
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded thread pool so logins never block the event loop.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    At most `workers + max_queue` calls are admitted at once; the rest are
+    rejected with `PasswordHasherBusy`. `workers=0` hashes inline.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.workers <= 0:
+            started = time.perf_counter()
+            result = fn(*args)
+            self._record(0.0, time.perf_counter() - started)
+            return result
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, took = await loop.run_in_executor(self._get_executor(), timed)
+        finally:
+            self.pending -= 1
+        self._record(waited, took)
+        return result
+
+    def _record(self, waited: float, took: float):
+        self.calls += 1
+        self.wait_seconds += waited
+        self.hash_seconds += took
+        password_hash_seconds.observe(took)
+        password_hash_wait_seconds.observe(waited)
+        record_bcrypt(waited + took)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "pending": self.pending,
+            "wait_seconds": self.wait_seconds,
+            "hash_seconds": self.hash_seconds,
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.now() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt_module().encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# === Verified token cache ===
+class VerifiedTokenCache:
+    """
+    Decoded payloads of already-verified tokens, keyed by a SHA-256 digest of
+    the token and expiring at the token's own `exp`.
+
+    Lookups and inserts never await, so concurrent requests on the event
+    loop can't interleave inside them.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        payload = self._cache.get(self._key(token))
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def set(self, token: str, payload: dict):
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            self._cache.set(self._key(token), payload, ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+verified_tokens = VerifiedTokenCache(TOKEN_CACHE_MAX_ENTRIES)
 
 def decode_access_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if "sub" not in payload:
-            raise JWTError("Token missing subject (sub)")
+    payload = verified_tokens.get(token)
+    if payload is not None:
         return payload
+    from jose import JWTError, ExpiredSignatureError
+
+    try:
+        payload = jwt_module().decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except ExpiredSignatureError as e:
-        raise ExpiredSignatureError("Token has expired") from e
+        raise TokenExpired("Token has expired") from e
     except JWTError as e:
-        raise JWTError("Token is invalid") from e
+        raise InvalidToken("Token is invalid") from e
+    if "sub" not in payload:
+        raise InvalidToken("Token missing subject (sub)")
+    verified_tokens.set(token, payload)
+    return payload
 
 # def decode_access_token(token: str):
 #     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
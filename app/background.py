@@ -0,0 +1,39 @@
+import asyncio
+from typing import Optional
+
+
+class PeriodicFlusher:
+    """
+    Base for in-memory write buffers: `flush()` runs every `interval` seconds
+    on a background task, or as soon as `wakeup` is set (buffer full).
+    """
+
+    def __init__(self):
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def flush(self) -> int:
+        raise NotImplementedError
+
+    async def run(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    def start(self, interval: float) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(interval))
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
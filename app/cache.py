@@ -0,0 +1,236 @@
+import hashlib
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .config import (
+    CACHE_URL, PROFILE_CACHE_TTL, PROFILE_CACHE_MAX_ENTRIES,
+    PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_MAX_ENTRIES,
+    LINK_URL_CACHE_TTL, LINK_URL_CACHE_MAX_ENTRIES
+)
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# === Pluggable backends ===
+class CacheBackend:
+    """Async key/value store interface (in-process, Redis, ...)."""
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        """Atomically bumps a counter (never evicted) and returns the new value."""
+        raise NotImplementedError
+
+    async def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per process: every worker has its own copy."""
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize)
+        self._counters = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.pop(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+        self._counters.clear()
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared by every worker; any Redis-protocol server, needs the `redis` package."""
+
+    PREFIX = "cache:"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError(f"CACHE_URL={url} needs the redis package: pip install redis") from None
+
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(self.PREFIX + key)
+        return None if value is None else pickle.loads(value)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.PREFIX + key, pickle.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.PREFIX + key for key in keys))
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.PREFIX + "*"):
+            await self.client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.PREFIX + key)
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(self.PREFIX + key) or 0)
+
+
+def backend_from_url(url: str, maxsize: int) -> CacheBackend:
+    if url == "memory":
+        return MemoryCacheBackend(maxsize)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unknown cache backend: {url}")
+
+
+# === Public profile snapshots ===
+class ProfileCache:
+    """
+    Pre-encoded public profile responses (body bytes, plus whatever else
+    the endpoint needs to rebuild the response, e.g. a next-page cursor).
+
+    Each profile has a cached head (owner id + content version) and any number
+    of snapshots keyed by version, so a version bump makes old snapshots
+    unreachable. Writes go through `crud`, which only knows the owner's user
+    id, so an owner -> username entry is stored next to every head.
+
+    A head read from the database is only stored if its owner was not
+    invalidated since the read started: `clock()` before the read, compared
+    with the tick of the owner's last invalidation in set_head().
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get_head(self, username: str) -> Optional[Tuple[int, int]]:
+        return await self.backend.get(f"profile-head:{username}")
+
+    async def clock(self) -> int:
+        return await self.backend.counter("profile-clock")
+
+    async def set_head(self, username: str, user_id: int, version: int, since: int) -> None:
+        invalidated = await self.backend.get(f"profile-invalidated:{user_id}")
+        if invalidated is not None and invalidated > since:
+            return  # written meanwhile: this version may already be stale
+        await self.backend.set(f"profile-head:{username}", (user_id, version), self.ttl)
+        await self.backend.set(f"profile-owner:{user_id}", username, self.ttl)
+
+    async def get_snapshot(self, username: str, version: int, variant: str) -> Optional[Any]:
+        snapshot = await self.backend.get(f"profile:{username}:{version}:{variant}")
+        if snapshot is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return snapshot
+
+    async def set_snapshot(self, username: str, version: int, variant: str, snapshot: Any) -> None:
+        await self.backend.set(f"profile:{username}:{version}:{variant}", snapshot, self.ttl)
+
+    async def invalidate(self, user_id: int) -> None:
+        tick = await self.backend.incr("profile-clock")
+        await self.backend.set(f"profile-invalidated:{user_id}", tick, self.ttl)
+        username = await self.backend.get(f"profile-owner:{user_id}")
+        if username is not None:
+            await self.backend.delete(f"profile-head:{username}", f"profile-owner:{user_id}")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def make_etag(user_id: int, version: int, variant: str) -> str:
+    digest = hashlib.sha1(f"{user_id}:{version}:{variant}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+# Compressed variants get their own strong ETag ("<etag>-gz"), see app.responses
+ETAG_ENCODING_SUFFIXES = {"gzip": "-gz", "br": "-br"}
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}{ETAG_ENCODING_SUFFIXES[encoding]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if the client holds any encoding of this version."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    variants = {etag, *(encoded_etag(etag, encoding) for encoding in ETAG_ENCODING_SUFFIXES)}
+    return "*" in candidates or any(tag in variants for tag in candidates)
+
+
+profile_cache = ProfileCache(backend_from_url(CACHE_URL, PROFILE_CACHE_MAX_ENTRIES), PROFILE_CACHE_TTL)
+
+# user id -> (username, token_version) for the stateless auth fast path
+principal_cache = TTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL)
+
+# link id -> target URL for the /r/{link_id} redirect
+link_targets = TTLCache(LINK_URL_CACHE_MAX_ENTRIES, LINK_URL_CACHE_TTL)
@@ -0,0 +1,106 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .background import PeriodicFlusher
+from .config import CLICK_FLUSH_INTERVAL, CLICK_BUFFER_MAX_KEYS, CLICK_BUFFER_ENABLED
+from .crud import upsert_link_clicks
+from .database import AsyncSessionLocal
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ClickKey = Tuple[int, datetime]
+
+click_flush_seconds = registry.histogram(
+    "click_flush_seconds", "Time spent upserting buffered clicks"
+)
+clicks_flushed = registry.counter(
+    "clicks_flushed_total", "Clicks written to link_clicks"
+)
+
+
+def hour_bucket(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.now(timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+class ClickBuffer(PeriodicFlusher):
+    """
+    Per-worker click counts keyed by (link_id, hour). The redirect only bumps a
+    dict entry; a background task swaps the dict out and upserts it in one
+    statement. Counts that fail to flush are merged back for the next round.
+    With `buffered` off every click is upserted as it happens.
+    """
+
+    def __init__(self, max_keys: int = CLICK_BUFFER_MAX_KEYS, buffered: bool = CLICK_BUFFER_ENABLED):
+        super().__init__()
+        self.max_keys = max_keys
+        self.buffered = buffered
+        self.counts: Dict[ClickKey, int] = {}
+        self.flushing: Dict[ClickKey, int] = {}
+
+    def record(self, link_id: int) -> None:
+        key = (link_id, hour_bucket())
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if len(self.counts) >= self.max_keys:
+            self.wakeup.set()
+
+    async def click(self, link_id: int) -> None:
+        if self.buffered:
+            self.record(link_id)
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await upsert_link_clicks(db, {(link_id, hour_bucket()): 1})
+        except Exception as e:
+            # A lost click must not break the redirect
+            logger.error(f"Click write failed for link {link_id}: {e}")
+            return
+        clicks_flushed.inc()
+
+    def pending(self, link_id: int) -> Dict[datetime, int]:
+        """Clicks for one link that have not reached the database yet."""
+        hours: Dict[datetime, int] = {}
+        for counts in (self.flushing, self.counts):
+            for (key_link_id, hour), n in counts.items():
+                if key_link_id == link_id:
+                    hours[hour] = hours.get(hour, 0) + n
+        return hours
+
+    def __len__(self):
+        return len(self.counts)
+
+    async def flush(self) -> int:
+        if not self.counts:
+            return 0
+        self.flushing, self.counts = self.counts, {}
+        started = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                await upsert_link_clicks(db, self.flushing)
+        except BaseException as e:
+            # Includes cancellation at shutdown: stop() flushes the merged counts again
+            for key, n in self.flushing.items():
+                self.counts[key] = self.counts.get(key, 0) + n
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"Click flush failed, keeping {len(self.flushing)} entries: {e}")
+            return 0
+        finally:
+            click_flush_seconds.observe(time.perf_counter() - started)
+            flushed, self.flushing = self.flushing, {}
+        total = sum(flushed.values())
+        clicks_flushed.inc(total)
+        return total
+
+    def start(self, interval: float = CLICK_FLUSH_INTERVAL) -> None:
+        super().start(interval)
+
+
+click_buffer = ClickBuffer()
+
+registry.add_collector(lambda: [
+    ("clicks_buffered", "gauge", "Link/hour click counters waiting to be flushed", len(click_buffer)),
+])
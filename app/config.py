@@ -1,8 +1,170 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DEBUG = os.getenv("DEBUG", "true").lower() == "true"
+USE_CLOUDINARY = not DEBUG
+
+PORT = int(os.getenv("PORT", 8000))
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+# Create the DB engine and import the auth libraries at startup rather than on
+# first use. Off on Vercel, where a cold start should only pay for its request.
+PRELOAD_ON_STARTUP = os.getenv(
+    "PRELOAD_ON_STARTUP", "false" if os.getenv("VERCEL") else "true"
+).lower() == "true"
+
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Verified access tokens kept in memory until their own `exp`
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+
+# Public profile cache: "memory" (per worker; other workers see a change
+# within PROFILE_CACHE_TTL) or a redis:// URL shared by every worker
+CACHE_URL = os.getenv("CACHE_URL", "memory")
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", 60))
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", 1024))
+
+# Password hashing pool (bcrypt runs off the event loop)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 32))
+
+# Authenticated principals (uid + token version) cached per worker
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 30))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 4096))
+
+# Rate limiting (token buckets). Storage: "memory" (per worker), "database"
+# (rate_limit_buckets table, shared) or a redis:// URL. Public profile reads
+# default to per-worker buckets so cached profiles stay off the database.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory" if DEBUG else "database")
+RATE_LIMIT_PUBLIC_STORAGE = os.getenv("RATE_LIMIT_PUBLIC_STORAGE", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+RATE_LIMIT_REGISTER = os.getenv("RATE_LIMIT_REGISTER", "5/minute")
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+# Failed logins per target username and IP; successful logins are not counted
+RATE_LIMIT_LOGIN_PER_USER = os.getenv("RATE_LIMIT_LOGIN_PER_USER", "30/hour")
+# Failed logins per target username across all IPs (guessing spread over many IPs)
+RATE_LIMIT_LOGIN_PER_ACCOUNT = os.getenv("RATE_LIMIT_LOGIN_PER_ACCOUNT", "100/hour")
+RATE_LIMIT_PUBLIC = os.getenv("RATE_LIMIT_PUBLIC", "120/minute")
+
+# Response compression (gzip, or brotli when the `brotli` package is installed)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+# Compressed bodies of ETag'd responses (profile snapshots) kept per worker
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", 1024))
+
+# Slow request / slow query warnings (logger "app.perf"), in seconds
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 1.0))
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", 0.2))
+
+# /metrics (Prometheus text format); set METRICS_TOKEN to require a bearer token.
+# Outside DEBUG the endpoint is only served when a token is set.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Max items accepted by the /links/batch endpoints
+LINK_BATCH_MAX_SIZE = int(os.getenv("LINK_BATCH_MAX_SIZE", 100))
+
+# Click tracking: /r/{link_id} targets cached per worker. Edits and deletes
+# clear the entry in the worker that handled them; other workers may redirect
+# to the old URL for up to LINK_URL_CACHE_TTL seconds.
+LINK_URL_CACHE_TTL = int(os.getenv("LINK_URL_CACHE_TTL", 10))
+LINK_URL_CACHE_MAX_ENTRIES = int(os.getenv("LINK_URL_CACHE_MAX_ENTRIES", 10000))
+# Clicks buffered in memory and upserted into link_clicks every
+# CLICK_FLUSH_INTERVAL seconds (or sooner once CLICK_BUFFER_MAX_KEYS link/hour
+# pairs are pending). Off on Vercel, where a frozen instance would never flush:
+# each click is then written before the redirect is sent.
+CLICK_BUFFER_ENABLED = os.getenv(
+    "CLICK_BUFFER_ENABLED", "false" if os.getenv("VERCEL") else "true"
+).lower() == "true"
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", 10))
+CLICK_BUFFER_MAX_KEYS = int(os.getenv("CLICK_BUFFER_MAX_KEYS", 10000))
+
+# Profile view analytics: per-day HyperLogLog sketches buffered per worker.
+# Off on Vercel like CLICK_BUFFER_ENABLED: each view is then merged before responding.
+ANALYTICS_BUFFER_ENABLED = os.getenv(
+    "ANALYTICS_BUFFER_ENABLED", "false" if os.getenv("VERCEL") else "true"
+).lower() == "true"
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 30))
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", 2048))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", 365))
+
+# /search: at most SEARCH_MAX_CANDIDATES matches are ranked per query, so a
+# term that matches millions of links costs the same as a rare one
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 1000))
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", 8))
+
+# Background jobs (jobs table). Workers run in every app process, started in
+# the lifespan. With JOB_WORKERS_ENABLED=false (default on Vercel, where nothing
+# runs after the response) jobs run inline when enqueued, unless a separate
+# `python -m app.jobs` worker claims them first.
+JOB_WORKERS_ENABLED = os.getenv(
+    "JOB_WORKERS_ENABLED", "false" if os.getenv("VERCEL") else "true"
+).lower() == "true"
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# Retry n waits min(base * 2^(n-1), max) seconds, minus up to half as jitter
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", 2))
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", 300))
+# Running jobs per type and process, e.g. "avatar=2,linkcheck=16" (overrides the defaults)
+JOB_CONCURRENCY = {
+    name.strip(): int(limit)
+    for name, limit in (item.split("=") for item in os.getenv("JOB_CONCURRENCY", "").split(",") if item)
+}
+# Seconds shutdown waits for running jobs before handing them back to the queue
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv("JOB_SHUTDOWN_TIMEOUT", 10))
+# Finished jobs are deleted after this many hours
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", 24 * 7))
+
+# Link health checks (app.linkcheck): a recurring job checks up to
+# LINKCHECK_BATCH_SIZE links that are new or older than LINKCHECK_RECHECK_HOURS
+# every LINKCHECK_INTERVAL seconds (back to back while there is a backlog)
+LINKCHECK_ENABLED = os.getenv("LINKCHECK_ENABLED", "true").lower() == "true"
+LINKCHECK_INTERVAL = float(os.getenv("LINKCHECK_INTERVAL", 60))
+LINKCHECK_BATCH_SIZE = int(os.getenv("LINKCHECK_BATCH_SIZE", 100))
+LINKCHECK_RECHECK_HOURS = float(os.getenv("LINKCHECK_RECHECK_HOURS", 24))
+# Per request (connect / read); redirects are followed up to LINKCHECK_MAX_REDIRECTS hops
+LINKCHECK_TIMEOUT = float(os.getenv("LINKCHECK_TIMEOUT", 5))
+LINKCHECK_MAX_REDIRECTS = int(os.getenv("LINKCHECK_MAX_REDIRECTS", 5))
+# Requests in flight per process / per host (host:port)
+LINKCHECK_MAX_CONNECTIONS = int(os.getenv("LINKCHECK_MAX_CONNECTIONS", 20))
+LINKCHECK_PER_HOST = int(os.getenv("LINKCHECK_PER_HOST", 2))
+# HTML read per page looking for <title>, og:title and icons
+LINKCHECK_MAX_BYTES = int(os.getenv("LINKCHECK_MAX_BYTES", 256 * 1024))
+# Results per URL and favicons per site, cached per process
+LINKCHECK_CACHE_TTL = int(os.getenv("LINKCHECK_CACHE_TTL", 600))
+LINKCHECK_CACHE_MAX_ENTRIES = int(os.getenv("LINKCHECK_CACHE_MAX_ENTRIES", 10000))
+LINKCHECK_USER_AGENT = os.getenv("LINKCHECK_USER_AGENT", "LinkInBioBot/1.0 (link health check)")
+# Private / loopback / link-local targets are refused (SSRF); true only for local testing
+LINKCHECK_ALLOW_PRIVATE = os.getenv("LINKCHECK_ALLOW_PRIVATE", "false").lower() == "true"
+
+# Media / avatar uploads
+MEDIA_DIR = "media"
+AVATAR_DIR = os.path.join(MEDIA_DIR, "avatars")
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Hard cap on any request body (avatar plus form overhead)
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", AVATAR_MAX_BYTES + 1024 * 1024))
+# Uploads are streamed here and wait for their avatar job; a standalone worker
+# (`python -m app.jobs`) must see the same directory
+AVATAR_STAGING_DIR = os.getenv("AVATAR_STAGING_DIR", os.path.join(tempfile.gettempdir(), "linkinbio-uploads"))
+
+# Avatar variants (square thumbnails) rendered in a process pool; 0 workers = thread
+AVATAR_SIZES = tuple(int(size) for size in os.getenv("AVATAR_SIZES", "64,128,256,512").split(","))
+AVATAR_FORMATS = tuple(os.getenv("AVATAR_FORMATS", "avif,webp").split(","))
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", 40_000_000))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# /media serving (local storage): Cache-Control max-age for files that may
+# change, and a per-worker LRU of small immutable files (0 entries disables it)
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", 3600))
+MEDIA_CACHE_TTL = int(os.getenv("MEDIA_CACHE_TTL", 600))
+MEDIA_CACHE_MAX_ENTRIES = int(os.getenv("MEDIA_CACHE_MAX_ENTRIES", 512))
+MEDIA_CACHE_MAX_FILE_BYTES = int(os.getenv("MEDIA_CACHE_MAX_FILE_BYTES", 64 * 1024))
+
+# Where avatars live: "local" (MEDIA_DIR), "cloudinary" or "memory" (tests)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary" if USE_CLOUDINARY else "local")
@@ -1,48 +1,99 @@
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, load_only
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update, delete
-from . import models, schemas, auth
+from sqlalchemy import update, delete, insert, func, case, tuple_, and_, or_, bindparam
+from sqlalchemy.engine import make_url
+from . import models, schemas, auth, search
+from .cache import profile_cache, principal_cache, link_targets
+from .database import DATABASE_URL, get_engine, mark_written
 
-async def get_user_by_username(db: AsyncSession, username: str):
-    result = await db.execute(select(models.User).where(models.User.username == username))
+# Columns the login path needs; the bio, avatar and links stay in the database
+AUTH_COLUMNS = (models.User.id, models.User.username, models.User.hashed_password, models.User.token_version)
+
+def user_query(*columns, with_links: bool = False):
+    """
+    User.links is lazy="raise", so every query states what it loads:
+    `columns` narrows the row (anything else raises if touched), `with_links`
+    adds one selectin query for the links.
+    """
+    query = select(models.User)
+    if columns:
+        query = query.options(load_only(*columns, raiseload=True))
+    if with_links:
+        query = query.options(selectinload(models.User.links))
+    return query
+
+async def get_user_by_username(db: AsyncSession, username: str, *columns):
+    result = await db.execute(user_query(*columns).where(models.User.username == username))
     return result.scalar_one_or_none()
 
+async def get_token_state(db: AsyncSession, user_id: int = None, username: str = None):
+    # Only what the auth fast path needs; never touches links
+    if user_id is not None:
+        condition = models.User.id == user_id
+    else:
+        condition = models.User.username == username
+    result = await db.execute(
+        select(models.User.id, models.User.username, models.User.token_version).where(condition)
+    )
+    return result.one_or_none()
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int):
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(token_version=models.User.token_version + 1)
+    )
+    await db.commit()
+    principal_cache.pop(user_id)
+
+async def get_profile_head(db: AsyncSession, username: str):
+    result = await db.execute(
+        select(models.User.id, models.User.version).where(models.User.username == username)
+    )
+    return result.one_or_none()
+
+async def bump_profile_version(db: AsyncSession, user_id: int):
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(version=models.User.version + 1)
+    )
+    # Their reads stay on the primary until replicas have caught up
+    await mark_written(user_id)
+
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_pw = auth.hash_password(user.password)
-    db_user = models.User(
-        username=user.username,
-        email=user.email,
-        hashed_password=hashed_pw
+    hashed_pw = await auth.hash_password_async(user.password)
+    db_user = await db.scalar(
+        insert(models.User)
+        .values(username=user.username, email=user.email, hashed_password=hashed_pw)
+        .returning(models.User)
     )
-    db.add(db_user)
     await db.commit()
-    await db.refresh(db_user)
     return db_user
 
 async def authenticate_user(db: AsyncSession, username: str, password: str):
-    user = await get_user_by_username(db, username)
-    if not user or not auth.verify_password(password, user.hashed_password):
+    user = await get_user_by_username(db, username, *AUTH_COLUMNS)
+    if not user or not await auth.verify_password_async(password, user.hashed_password):
         return None
     return user
 
-async def get_user_links(db: AsyncSession, username: str, limit=10, offset=0):
-    user = await get_user_by_username(db, username)
-    if not user:
-        return []
-    result = await db.execute(
-        select(models.Link)
-        .where(models.Link.user_id == user.id)
-        .offset(offset)
-        .limit(limit)
+def next_link_position(user_id: int):
+    return (
+        select(func.coalesce(func.max(models.Link.position), -1) + 1)
+        .where(models.Link.user_id == user_id)
     )
-    return result.scalars().all()
 
 async def create_link(db: AsyncSession, user_id: int, link: schemas.LinkCreate):
-    db_link = models.Link(title=link.title, url=link.url, user_id=user_id)
-    db.add(db_link)
+    position = link.position if link.position is not None else next_link_position(user_id).scalar_subquery()
+    db_link = await db.scalar(
+        insert(models.Link)
+        .values(title=link.title, url=link.url, user_id=user_id, position=position)
+        .returning(models.Link)
+    )
+    await bump_profile_version(db, user_id)
     await db.commit()
-    await db.refresh(db_link)
+    await profile_cache.invalidate(user_id)
     return db_link
 
 async def get_link_by_id(db: AsyncSession, link_id: int, user_id: int):
@@ -51,58 +102,226 @@ async def get_link_by_id(db: AsyncSession, link_id: int, user_id: int):
     )
     return result.scalar_one_or_none()
 
+# Written by app.linkcheck; cleared when the URL changes so the link is checked again
+LINK_CHECK_FIELDS = ("http_status", "final_url", "favicon_url", "og_title", "check_error", "checked_at")
+
+def link_changes(link_data: schemas.LinkUpdate) -> dict:
+    changes = {
+        field: value
+        for field, value in link_data.model_dump(include={"title", "url", "position"}).items()
+        if value is not None
+    }
+    if "url" in changes:
+        changes.update(dict.fromkeys(LINK_CHECK_FIELDS))
+    return changes
+
 async def update_link(db: AsyncSession, link_id: int, user_id: int, link_data: schemas.LinkUpdate):
-    result = await db.execute(
-        select(models.Link).where(models.Link.id == link_id, models.Link.user_id == user_id)
+    changes = link_changes(link_data)
+    if not changes:
+        return await get_link_by_id(db, link_id, user_id)
+
+    # UPDATE ... WHERE id AND user_id RETURNING: ownership check, write and read in one
+    link = await db.scalar(
+        update(models.Link)
+        .where(models.Link.id == link_id, models.Link.user_id == user_id)
+        .values(**changes)
+        .returning(models.Link)
     )
-    link = result.scalar_one_or_none()
     if not link:
         return None
-    if link_data.title is not None:
-        link.title = link_data.title
-    if link_data.url is not None:
-        link.url = link_data.url
+    await bump_profile_version(db, user_id)
     await db.commit()
-    await db.refresh(link)
+    await profile_cache.invalidate(user_id)
+    link_targets.pop(link_id)
     return link
 
 async def delete_link(db: AsyncSession, link_id: int, user_id: int):
+    link = await db.scalar(
+        delete(models.Link)
+        .where(models.Link.id == link_id, models.Link.user_id == user_id)
+        .returning(models.Link)
+    )
+    if not link:
+        return None
+    await bump_profile_version(db, user_id)
+    await db.commit()
+    await profile_cache.invalidate(user_id)
+    link_targets.pop(link_id)
+    return link
+
+# === Batch link operations (one transaction each) ===
+async def get_owned_link_ids(db: AsyncSession, user_id: int, link_ids):
     result = await db.execute(
-        select(models.Link).where(models.Link.id == link_id, models.Link.user_id == user_id)
+        select(models.Link.id).where(models.Link.user_id == user_id, models.Link.id.in_(link_ids))
     )
-    link = result.scalar_one_or_none()
-    if link:
-        await db.delete(link)
+    return set(result.scalars().all())
+
+async def create_links(db: AsyncSession, user_id: int, links):
+    start = await db.scalar(next_link_position(user_id))
+    rows = [
+        {
+            "title": link.title,
+            "url": link.url,
+            "user_id": user_id,
+            "position": link.position if link.position is not None else start + i,
+        }
+        for i, link in enumerate(links)
+    ]
+    # SQLite cannot order RETURNING, so SQLAlchemy would send one INSERT per row
+    # to keep the input order; its rowids follow the VALUES order, so sort by id
+    in_order = db.get_bind().dialect.name != "sqlite"
+    result = await db.scalars(
+        insert(models.Link).returning(models.Link, sort_by_parameter_order=in_order), rows
+    )
+    created = result.all() if in_order else sorted(result.all(), key=lambda link: link.id)
+    await bump_profile_version(db, user_id)
+    await db.commit()
+    await profile_cache.invalidate(user_id)
+    return created
+
+async def update_links(db: AsyncSession, user_id: int, items):
+    link_ids = [item.id for item in items]
+    if await get_owned_link_ids(db, user_id, link_ids) != set(link_ids):
+        return None
+
+    # One UPDATE ... SET col = CASE id WHEN ... END for every changed column
+    values = {}
+    for field in ("title", "url", "position"):
+        changes = {item.id: getattr(item, field) for item in items if getattr(item, field) is not None}
+        if changes:
+            column = getattr(models.Link, field)
+            values[field] = case(changes, value=models.Link.id, else_=column)
+    new_urls = [item.id for item in items if item.url is not None]
+    if new_urls:
+        for field in LINK_CHECK_FIELDS:
+            column = getattr(models.Link, field)
+            values[field] = case((models.Link.id.in_(new_urls), None), else_=column)
+
+    query = select(models.Link).where(models.Link.user_id == user_id, models.Link.id.in_(link_ids))
+    if values:
+        query = (
+            update(models.Link)
+            .where(models.Link.user_id == user_id, models.Link.id.in_(link_ids))
+            .values(**values)
+            .returning(models.Link)
+        )
+    links = {link.id: link for link in (await db.scalars(query)).all()}
+    if values:
+        await bump_profile_version(db, user_id)
         await db.commit()
-    return link
+        await profile_cache.invalidate(user_id)
+        for link_id in link_ids:
+            link_targets.pop(link_id)
+    return [links[link_id] for link_id in link_ids]
 
-async def update_user_profile(db: AsyncSession, user_id: int, data: schemas.UserUpdate):
+async def delete_links(db: AsyncSession, user_id: int, link_ids):
+    if await get_owned_link_ids(db, user_id, link_ids) != set(link_ids):
+        return None
+    await db.execute(
+        delete(models.Link).where(models.Link.user_id == user_id, models.Link.id.in_(link_ids))
+    )
+    await bump_profile_version(db, user_id)
+    await db.commit()
+    await profile_cache.invalidate(user_id)
+    for link_id in link_ids:
+        link_targets.pop(link_id)
+    return link_ids
+
+# === Click / view analytics ===
+def upsert_statement(db: AsyncSession, model):
+    """INSERT that supports .on_conflict_do_update() on the session's dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    return upsert(model)
+
+async def get_link_url(db: AsyncSession, link_id: int):
+    return await db.scalar(select(models.Link.url).where(models.Link.id == link_id))
+
+async def upsert_link_clicks(db: AsyncSession, counts):
+    """
+    Adds {(link_id, hour): n} onto link_clicks in one multi-row
+    INSERT ... ON CONFLICT DO UPDATE. Clicks on links deleted since are dropped.
+    """
+    link_ids = {link_id for link_id, _ in counts}
+    existing = set((await db.scalars(
+        select(models.Link.id).where(models.Link.id.in_(link_ids))
+    )).all())
+    rows = [
+        {"link_id": link_id, "hour": hour, "count": n}
+        for (link_id, hour), n in counts.items() if link_id in existing
+    ]
+    if rows:
+        query = upsert_statement(db, models.LinkClick).values(rows)
+        await db.execute(query.on_conflict_do_update(
+            index_elements=[models.LinkClick.link_id, models.LinkClick.hour],
+            set_={"count": models.LinkClick.count + query.excluded.count},
+        ))
+    await db.commit()
+    return len(rows)
+
+async def get_link_clicks(db: AsyncSession, link_id: int, since):
     result = await db.execute(
-        select(models.User).where(models.User.id == user_id)
+        select(models.LinkClick.hour, models.LinkClick.count)
+        .where(models.LinkClick.link_id == link_id, models.LinkClick.hour >= since)
+        .order_by(models.LinkClick.hour)
+    )
+    return result.all()
+
+async def update_user_profile(db: AsyncSession, user_id: int, data: schemas.UserUpdate):
+    changes = {
+        field: value
+        for field, value in data.model_dump(include={"bio", "avatar_url", "avatar_variants"}).items()
+        if value is not None
+    }
+    # The content version bump rides along in the same UPDATE
+    user = await db.scalar(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(**changes, version=models.User.version + 1)
+        .returning(models.User)
+        .options(selectinload(models.User.links))  # UserOut includes them
     )
-    user = result.scalar_one_or_none()
     if not user:
         return None
-    if data.bio is not None:
-        user.bio = data.bio
-    if data.avatar_url is not None:
-        user.avatar_url = data.avatar_url
+    await mark_written(user_id)
     await db.commit()
-    await db.refresh(user)
+    await profile_cache.invalidate(user_id)
     return user
 
-async def get_user_by_id(db: AsyncSession, user_id: int):
-    result = await db.execute(select(models.User).where(models.User.id == user_id))
+async def avatar_in_use(db: AsyncSession, avatar_url: str, exclude_user_id: int = None) -> bool:
+    """Avatar files are content-addressed, so several users may share one."""
+    query = select(models.User.id).where(models.User.avatar_url == avatar_url)
+    if exclude_user_id is not None:
+        query = query.where(models.User.id != exclude_user_id)
+    return await db.scalar(select(query.exists()))
+
+async def get_user_by_id(db: AsyncSession, user_id: int, *columns, with_links: bool = False):
+    result = await db.execute(user_query(*columns, with_links=with_links).where(models.User.id == user_id))
     return result.scalar_one_or_none()
 
-async def get_links_by_user_id(db: AsyncSession, user_id: int):
-    result = await db.execute(select(models.Link).where(models.Link.user_id == user_id))
+async def get_links_by_user_id(db: AsyncSession, user_id: int, limit=None, offset=0, after=None):
+    query = (
+        select(models.Link)
+        .where(models.Link.user_id == user_id)
+        .order_by(models.Link.position, models.Link.id)
+        .limit(limit)
+    )
+    # Keyset pagination walks the (user_id, position, id) index; offset is kept for old clients
+    if after is not None:
+        query = query.where(tuple_(models.Link.position, models.Link.id) > tuple_(*after))
+    elif offset:
+        query = query.offset(offset)
+    result = await db.execute(query)
     return result.scalars().all()
 
 async def get_public_profile(db: AsyncSession, username: str):
     result = await db.execute(
-        select(models.User)
-        .options(selectinload(models.User.links))  # ✅ eager load
+        user_query(
+            models.User.id, models.User.version, models.User.username, models.User.bio,
+            models.User.avatar_url, models.User.avatar_variants, with_links=True,  # ✅ eager load
+        )
         .where(models.User.username == username)
     )
     user = result.scalars().first()
@@ -110,11 +329,306 @@ async def get_public_profile(db: AsyncSession, username: str):
         return None
 
     return {
+        "id": user.id,
+        "version": user.version,
         "username": user.username,
         "bio": user.bio,
         "avatar_url": user.avatar_url,
+        "avatar_variants": user.avatar_variants,
         "links": [
-            {"id": link.id, "title": link.title, "url": link.url}
+            {
+                "id": link.id, "title": link.title, "url": link.url, "position": link.position,
+                **{field: getattr(link, field) for field in LINK_CHECK_FIELDS},
+            }
             for link in user.links
         ],
-    }
\ No newline at end of file
+    }
+
+async def get_profile_view_rollups(db: AsyncSession, keys, for_update=False):
+    """{(user_id, day): (views, sketch)} for the given keys, row-locked on Postgres."""
+    query = select(models.ProfileViewRollup).where(
+        tuple_(models.ProfileViewRollup.user_id, models.ProfileViewRollup.day).in_(list(keys))
+    )
+    if for_update:
+        query = query.with_for_update()
+    return {
+        (row.user_id, row.day): (row.views, row.sketch)
+        for row in (await db.scalars(query)).all()
+    }
+
+async def upsert_profile_view_rollups(db: AsyncSession, rows, stored):
+    """
+    rows: {(user_id, day): (views to add, merged sketch)}. Keys in `stored` (as
+    locked by get_profile_view_rollups) are updated, the others inserted; rows
+    of deleted users are dropped. Returns the keys another worker inserted
+    first: nothing was written for those, re-read and merge them again.
+    """
+    user_ids = {user_id for user_id, _ in rows}
+    existing = set((await db.scalars(
+        select(models.User.id).where(models.User.id.in_(user_ids))
+    )).all())
+    updates, inserts = [], []
+    for (user_id, day), (views, sketch) in rows.items():
+        if user_id not in existing:
+            continue
+        if (user_id, day) in stored:
+            views += stored[user_id, day][0]
+            updates.append({"user_id": user_id, "day": day, "views": views, "sketch": sketch})
+        else:
+            inserts.append({"user_id": user_id, "day": day, "views": views, "sketch": sketch})
+    raced = set()
+    if updates:
+        await db.execute(update(models.ProfileViewRollup), updates)
+    if inserts:
+        # No row to lock yet: a concurrent flush may insert the same day first
+        query = upsert_statement(db, models.ProfileViewRollup).values(inserts).on_conflict_do_nothing()
+        inserted = set((await db.execute(
+            query.returning(models.ProfileViewRollup.user_id, models.ProfileViewRollup.day)
+        )).tuples().all())
+        raced = {(row["user_id"], row["day"]) for row in inserts} - inserted
+    await db.commit()
+    return raced
+
+async def get_profile_view_range(db: AsyncSession, user_id: int, since):
+    result = await db.execute(
+        select(models.ProfileViewRollup.day, models.ProfileViewRollup.views, models.ProfileViewRollup.sketch)
+        .where(models.ProfileViewRollup.user_id == user_id, models.ProfileViewRollup.day >= since)
+        .order_by(models.ProfileViewRollup.day)
+    )
+    return result.all()
+
+# === Rate limit buckets ===
+async def take_rate_limit_token(db: AsyncSession, key: str, capacity: int, refill: float, cost: int, now: float):
+    """
+    Refill-then-consume on one token bucket in a single atomic upsert.
+    Returns (allowed, tokens left).
+    """
+    bucket = models.RateLimitBucket
+    elapsed = case((bucket.updated < now, now - bucket.updated), else_=0.0)
+    refilled = bucket.tokens + elapsed * refill
+    available = case((refilled > capacity, float(capacity)), else_=refilled)
+    query = upsert_statement(db, bucket).values(
+        key=key, tokens=float(capacity - cost), updated=now, allowed=cost <= capacity
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[bucket.key],
+        set_={
+            "tokens": case((available >= cost, available - cost), else_=available),
+            "updated": now,
+            "allowed": available >= cost,
+        },
+    ).returning(bucket.allowed, bucket.tokens)
+    allowed, tokens = (await db.execute(query)).one()
+    await db.commit()
+    return bool(allowed), tokens
+
+async def prune_rate_limit_buckets(db: AsyncSession, before: float):
+    await db.execute(delete(models.RateLimitBucket).where(models.RateLimitBucket.updated < before))
+    await db.commit()
+
+# === Link health checks ===
+async def claim_links_for_check(db: AsyncSession, limit: int, stale_before, now):
+    """
+    (id, url) of links never checked or last checked before `stale_before`.
+    Stamping checked_at claims them, so overlapping sweeps split the work; a
+    sweep that dies leaves its links to be checked again once they are stale.
+    """
+    link = models.Link
+    due = (
+        select(link.id)
+        .where(or_(link.checked_at.is_(None), link.checked_at < stale_before))
+        # Never-checked links first (Postgres sorts NULLs last by default)
+        .order_by(link.checked_at.asc().nulls_first(), link.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(link)
+        .where(link.id.in_(due.scalar_subquery()))
+        .values(checked_at=now)
+        .returning(link.id, link.url),
+        execution_options={"synchronize_session": False},
+    )
+    rows = result.all()
+    await db.commit()
+    return rows
+
+async def record_link_checks(db: AsyncSession, results: dict, urls: dict):
+    """
+    results: {link_id: {field: value}} for LINK_CHECK_FIELDS, found by checking
+    urls[link_id]. Only owners whose links changed get a profile version bump
+    (and fresh ETags). Returns how many profiles changed.
+    """
+    link = models.Link
+    columns = [getattr(link, field) for field in LINK_CHECK_FIELDS if field != "checked_at"]
+    # Links deleted or given a new URL meanwhile are skipped: the edit reset
+    # their check, and they are due again
+    current = {
+        row.id: row
+        for row in (await db.execute(
+            select(link.id, link.user_id, link.url, *columns).where(link.id.in_(list(results)))
+        )).all()
+        if row.url == urls[row.id]
+    }
+    changed_users = {
+        row.user_id for link_id, row in current.items()
+        if any(getattr(row, column.key) != results[link_id][column.key] for column in columns)
+    }
+    rows = [
+        {
+            "link_id": link_id, "checked_url": urls[link_id],
+            **{f"new_{field}": value for field, value in values.items()},
+        }
+        for link_id, values in results.items() if link_id in current
+    ]
+    if rows:
+        # The URL condition also covers an edit landing after the SELECT above
+        table = link.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("link_id"), table.c.url == bindparam("checked_url"))
+            .values({field: bindparam(f"new_{field}") for field in LINK_CHECK_FIELDS}),
+            rows,
+        )
+    if changed_users:
+        await db.execute(
+            update(models.User)
+            .where(models.User.id.in_(changed_users))
+            .values(version=models.User.version + 1)
+        )
+    await db.commit()
+    for user_id in changed_users:
+        await mark_written(user_id)
+        await profile_cache.invalidate(user_id)
+    return len(changed_users)
+
+# === Search ===
+async def create_search_index() -> bool:
+    """
+    SQLite (debug) keeps its FTS5 index outside the ORM schema and the
+    Postgres-only migrations, so it is created at startup. No-op elsewhere.
+    """
+    # Checked on the URL so a Postgres cold start doesn't create the engine here
+    if make_url(DATABASE_URL).get_backend_name() != "sqlite":
+        return False
+    async with get_engine().begin() as conn:
+        return await conn.run_sync(search.create_sqlite_index)
+
+async def search_users(db: AsyncSession, query: str, limit: int, after=None):
+    query = query.strip()
+    if not query:
+        return []
+    result = await db.execute(search.user_search(db.get_bind().dialect.name, query, limit, after))
+    return result.all()
+
+async def search_links(db: AsyncSession, query: str, limit: int, after=None):
+    terms = search.search_terms(query)
+    if not terms:
+        return []
+    result = await db.execute(search.link_search(db.get_bind().dialect.name, terms, limit, after))
+    return result.all()
+
+# === Jobs ===
+async def create_job(db: AsyncSession, job_type: str, payload: dict, max_attempts: int, run_at,
+                     user_id: int = None):
+    job_id = await db.scalar(
+        insert(models.Job)
+        .values(
+            type=job_type, payload=payload, max_attempts=max_attempts,
+            user_id=user_id, run_at=run_at, created_at=run_at,
+        )
+        .returning(models.Job.id)
+    )
+    await db.commit()
+    return job_id
+
+async def job_pending(db: AsyncSession, job_type: str, statuses=("queued",), digest: str = None) -> bool:
+    """Optionally only jobs whose payload "digest" starts with `digest` (content-addressed work)."""
+    query = select(models.Job.id).where(models.Job.type == job_type, models.Job.status.in_(statuses))
+    if digest is not None:
+        query = query.where(models.Job.payload["digest"].as_string().startswith(digest, autoescape=True))
+    return await db.scalar(select(query.exists()))
+
+async def claim_jobs(db: AsyncSession, job_type: str, limit: int, now, locked_until, job_id: int = None):
+    """
+    Marks up to `limit` due jobs as running in one UPDATE ... RETURNING. Also
+    takes back running jobs whose lease ran out. On Postgres, SKIP LOCKED lets
+    concurrent workers claim different rows. SQLite serializes writers anyway.
+    """
+    job = models.Job
+    due = or_(
+        and_(job.status == "queued", job.run_at <= now),
+        and_(job.status == "running", job.locked_until < now),
+    )
+    candidates = select(job.id).where(job.type == job_type, due)
+    if job_id is not None:
+        candidates = candidates.where(job.id == job_id)
+    candidates = candidates.order_by(job.run_at, job.id).limit(limit).with_for_update(skip_locked=True)
+    result = await db.scalars(
+        update(job)
+        .where(job.id.in_(candidates.scalar_subquery()))
+        .values(status="running", attempts=job.attempts + 1, locked_until=locked_until)
+        .returning(job),
+        execution_options={"synchronize_session": False},
+    )
+    jobs = result.all()
+    await db.commit()
+    return jobs
+
+async def finish_job(db: AsyncSession, job_id: int, status: str, finished_at=None, run_at=None,
+                     result=None, error: str = None, attempts=None):
+    """
+    Records the outcome of a claimed job. A `run_at` puts it back in the queue.
+    `attempts` overrides the counter, e.g. to refund a run cut short by shutdown.
+    """
+    values = {"status": status, "locked_until": None, "result": result, "last_error": error}
+    if run_at is not None:
+        values["run_at"] = run_at
+    if finished_at is not None:
+        values["finished_at"] = finished_at
+    if attempts is not None:
+        values["attempts"] = attempts
+    await db.execute(
+        update(models.Job).where(models.Job.id == job_id, models.Job.status == "running").values(**values)
+    )
+    await db.commit()
+
+JOB_STATUS_COLUMNS = (
+    models.Job.id, models.Job.type, models.Job.status, models.Job.attempts, models.Job.max_attempts,
+    models.Job.last_error, models.Job.result, models.Job.run_at, models.Job.created_at, models.Job.finished_at,
+)
+
+async def get_job(db: AsyncSession, job_id: int, user_id: int):
+    result = await db.execute(
+        select(*JOB_STATUS_COLUMNS).where(models.Job.id == job_id, models.Job.user_id == user_id)
+    )
+    return result.one_or_none()
+
+async def get_jobs_by_user_id(db: AsyncSession, user_id: int, limit: int, before: int = None):
+    # Newest first; `before` is the last id of the previous page
+    query = select(*JOB_STATUS_COLUMNS).where(models.Job.user_id == user_id)
+    if before is not None:
+        query = query.where(models.Job.id < before)
+    result = await db.execute(query.order_by(models.Job.id.desc()).limit(limit))
+    return result.all()
+
+async def newer_job_succeeded(db: AsyncSession, job_type: str, user_id: int, job_id: int) -> bool:
+    """Whether a later job of the same type already finished for this user (out-of-order results)."""
+    return await db.scalar(
+        select(
+            select(models.Job.id)
+            .where(
+                models.Job.type == job_type, models.Job.user_id == user_id,
+                models.Job.id > job_id, models.Job.status == "succeeded",
+            )
+            .exists()
+        )
+    )
+
+async def prune_jobs(db: AsyncSession, before):
+    result = await db.execute(
+        delete(models.Job).where(models.Job.finished_at < before),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    return result.rowcount
@@ -1,17 +1,29 @@
+import asyncio
+import itertools
+import logging
 import os
-from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import (create_async_engine, async_sessionmaker, 
-                                    AsyncAttrs)
-from sqlalchemy.orm import DeclarativeBase
+import time
+from typing import List, Optional
 
-# Load environment variables
-load_dotenv()
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import (create_async_engine, async_sessionmaker,
+                                    AsyncAttrs, AsyncEngine, AsyncSession)
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
-DEBUG = os.getenv("DEBUG", "true").lower() == "true"
+from app.cache import backend_from_url
+from app.config import DEBUG, CACHE_URL  # also loads .env, once
+from app.metrics import registry
+from app.instrumentation import record_statement
 
-if DEBUG:
+logger = logging.getLogger(__name__)
+
+if os.getenv("DATABASE_URL"):
+    DATABASE_URL = os.getenv("DATABASE_URL")
+elif DEBUG:
     DATABASE_URL = "sqlite+aiosqlite:///./dev.db"  # Use async SQLite driver
-    connect_args = {"check_same_thread": False}
 else:
     DB_USER = os.getenv("DB_USER")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
@@ -22,25 +34,394 @@ else:
     DATABASE_URL = (
         f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
-    connect_args = {}
 
-# ✅ Create async engine
-async_engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,
-    connect_args=connect_args
+# === Engine / Pool Settings ===
+# "serverless": no client-side pool (Vercel sets VERCEL=1); every request opens
+#               a connection, so point DB_HOST at an external pooler (PgBouncer,
+#               Supabase pooler) and set DB_STATEMENT_CACHE_SIZE=0.
+# "pooled":     long-running workers keep a QueuePool of warm connections.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "serverless" if os.getenv("VERCEL") else "pooled")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared statement caches (per connection); 0 disables them
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+
+# === Read Replicas ===
+# Comma-separated URLs of read-only copies of DATABASE_URL (same pool settings).
+# Endpoints taking get_read_db read from them; every write, and a user's reads
+# for DB_STICKY_SECONDS after they wrote, stay on the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Health check period; a replica that fails a check or a request sits out this long
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))
+DB_REPLICA_CHECK_TIMEOUT = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", 2))
+# PostgreSQL replicas replaying further behind than this (seconds) get no reads
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 10))
+# Keep >= DB_REPLICA_MAX_LAG so a replica has the write by the time reads return to it
+DB_STICKY_SECONDS = float(os.getenv("DB_STICKY_SECONDS", 10))
+# Who wrote recently is kept in CACHE_URL's backend: with the per-process
+# "memory" one, a write on one worker would not pin reads on another
+if DATABASE_REPLICA_URLS and CACHE_URL == "memory" and int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+    raise RuntimeError("Read replicas with several workers need a shared CACHE_URL (redis://...)")
+
+
+# === Telemetry ===
+pool_wait_seconds = registry.histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection"
+)
+statement_seconds = registry.histogram(
+    "db_statement_seconds", "SQL statement execution latency"
 )
 
 
+class TimedCheckoutMixin:
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(TimedCheckoutMixin, NullPool):
+    pass
+
+
+def instrument_engine(engine: AsyncEngine, pool_metrics: bool = True):
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        statement_seconds.observe(elapsed)
+        record_statement(statement, elapsed)
+
+    def collect():
+        pool = engine.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return []
+        return [
+            ("db_pool_size", "gauge", "Configured pool size", pool.size()),
+            ("db_pool_checked_out", "gauge", "Connections currently checked out", pool.checkedout()),
+            ("db_pool_overflow", "gauge", "Connections open beyond pool_size", max(pool.overflow(), 0)),
+        ]
+
+    if pool_metrics:
+        registry.add_collector(collect)
+    return engine
+
+
+def create_engine_from_settings(
+    url: str = DATABASE_URL, pool_mode: str = DB_POOL_MODE, pool_metrics: bool = True
+) -> AsyncEngine:
+    url = make_url(url)
+    options = {"echo": DB_ECHO, "connect_args": {}}
+
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"]["check_same_thread"] = False
+        if url.database not in (None, "", ":memory:"):
+            options["poolclass"] = TimedQueuePool
+    elif pool_mode == "serverless":
+        options["poolclass"] = TimedNullPool
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"]["statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)}
+        )
+
+    return instrument_engine(create_async_engine(url, **options), pool_metrics)
+
+
+# ✅ Async engine, created on first use: building it imports the driver
+# (asyncpg alone is ~80ms), which cold starts serving cached reads can skip
+_engine: Optional[AsyncEngine] = None
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_engine_from_settings()
+    return _engine
+
+
+async def dispose_engine() -> None:
+    await replicas.dispose()
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def __getattr__(name):
+    # `from app.database import async_engine` keeps working; it creates the engine
+    if name == "async_engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySessionmaker(async_sessionmaker):
+    """Binds to the engine when the first session is opened."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
 # ✅ Async session factory
-AsyncSessionLocal = async_sessionmaker(
-    bind=async_engine,
+AsyncSessionLocal = LazySessionmaker(
     expire_on_commit=False,
     autoflush=False,
     autocommit=False
 )
 
 
+# === Read Routing ===
+replica_up = registry.gauge("db_replica_up", "1 if the replica takes reads, 0 while it sits out", ["replica"])
+replica_lag = registry.gauge("db_replica_lag_seconds", "Replay lag seen by the last health check", ["replica"])
+read_sessions = registry.counter(
+    "db_read_sessions_total", "Read sessions by where they ran (replica, primary)", ["target"]
+)
+replica_failovers = registry.counter(
+    "db_replica_failovers_total", "Reads moved to the primary because a replica was unreachable", ["replica"]
+)
+
+# 0 on a server that is not in recovery (a primary) or has replayed all it received
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.engine: Optional[AsyncEngine] = None
+        self.down_until = 0.0
+        self.error: Optional[str] = None
+        replica_up.set(1, replica=name)
+
+    def get_engine(self) -> AsyncEngine:
+        if self.engine is None:
+            self.engine = create_engine_from_settings(self.url, pool_metrics=False)
+        return self.engine
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, error: str) -> None:
+        if self.error is None:
+            logger.warning(f"Replica {self.name} taken out of rotation: {error}")
+        self.error = error
+        self.down_until = time.monotonic() + DB_REPLICA_CHECK_INTERVAL
+        replica_up.set(0, replica=self.name)
+
+    def mark_up(self) -> None:
+        if self.error is not None:
+            logger.info(f"Replica {self.name} back in rotation")
+        self.error = None
+        self.down_until = 0.0
+        replica_up.set(1, replica=self.name)
+
+
+class ReplicaSet:
+    """
+    Read replicas, taken in turn. A replica that fails a health check or a
+    request, or lags more than DB_REPLICA_MAX_LAG, sits out for one check
+    interval; without the background checker it is simply tried again after.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(str(i), url) for i, url in enumerate(urls)]
+        self.turn = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[Replica]:
+        for _ in self.replicas:
+            replica = self.replicas[next(self.turn) % len(self.replicas)]
+            if replica.available:
+                return replica
+        return None
+
+    async def probe(self, replica: Replica) -> float:
+        engine = replica.get_engine()
+        async with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                return float(await conn.scalar(REPLICA_LAG_SQL))
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            lag = await asyncio.wait_for(self.probe(replica), DB_REPLICA_CHECK_TIMEOUT)
+        except Exception as e:
+            replica.mark_down(f"Health check failed: {type(e).__name__}: {e}")
+            return
+        replica_lag.set(lag, replica=replica.name)
+        if lag > DB_REPLICA_MAX_LAG:
+            replica.mark_down(f"{lag:.1f}s behind the primary")
+        else:
+            replica.mark_up()
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await self.check_all()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = DB_REPLICA_CHECK_INTERVAL) -> None:
+        if self.replicas and self.task is None:
+            self.task = asyncio.create_task(self.run(interval))
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            if replica.engine is not None:
+                await replica.engine.dispose()
+                replica.engine = None
+
+
+replicas = ReplicaSet(DATABASE_REPLICA_URLS)
+
+# user id -> True for DB_STICKY_SECONDS after a write
+recent_writers = backend_from_url(CACHE_URL, 100_000)
+
+
+async def mark_written(user_id: int) -> None:
+    await recent_writers.set(f"written:{user_id}", True, DB_STICKY_SECONDS)
+
+
+async def recently_written(user_id: int) -> bool:
+    return await recent_writers.get(f"written:{user_id}") is not None
+
+
+def on_replica(db: AsyncSession) -> bool:
+    return db.sync_session.info.get("replica") is not None
+
+
+def unreachable(error: Exception) -> bool:
+    return isinstance(error, (OSError, OperationalError, InterfaceError)) or (
+        isinstance(error, DBAPIError) and error.connection_invalidated
+    )
+
+
+class RoutingSession(Session):
+    """
+    Sync half of read sessions. Reads run on one replica, picked on first use
+    so a request sees a single consistent copy. Writes (and everything after
+    them), sessions moved over by read_your_writes, and requests arriving
+    while no replica is available run on the primary. If the replica cannot
+    be reached before it has answered anything, the session fails over to
+    the primary and retries the statement.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # No clause: a flush (caught by _flushing) or a dialect lookup
+        if self._flushing or clause is not None and (
+            not getattr(clause, "is_select", False) or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.info["primary"] = True
+        if not self.info.get("primary"):
+            if "replica" not in self.info:
+                self.info["replica"] = replicas.choose()
+                read_sessions.inc(target="primary" if self.info["replica"] is None else "replica")
+            if self.info["replica"] is not None:
+                return self.info["replica"].get_engine().sync_engine
+        return get_engine().sync_engine
+
+    def fail_over(self, error: Exception) -> bool:
+        replica = self.info.get("replica")
+        if replica is None or self.info.get("answered") or not unreachable(error):
+            return False
+        replica.mark_down(f"{type(error).__name__}: {error}")
+        replica_failovers.inc(replica=replica.name)
+        self.rollback()
+        self.info.update(replica=None, primary=True)
+        return True
+
+    def routed(self, method, *args, **kw):
+        try:
+            result = method(*args, **kw)
+        except (DBAPIError, OSError) as e:
+            if not self.fail_over(e):
+                raise
+            return method(*args, **kw)
+        if self.info.get("replica") is not None:
+            self.info["answered"] = True
+        return result
+
+    def execute(self, *args, **kw):
+        return self.routed(super().execute, *args, **kw)
+
+    def scalar(self, *args, **kw):
+        return self.routed(super().scalar, *args, **kw)
+
+    def scalars(self, *args, **kw):
+        return self.routed(super().scalars, *args, **kw)
+
+
+async def read_your_writes(db: AsyncSession, user_id: int) -> bool:
+    """
+    Moves a read session to the primary if `user_id` wrote within
+    DB_STICKY_SECONDS, since a replica may not have the write yet. Returns
+    True if the session had already read from a replica.
+    """
+    if not await recently_written(user_id):
+        return False
+    was_on_replica = on_replica(db)
+    db.sync_session.info.update(replica=None, primary=True)
+    return was_on_replica
+
+
+# ✅ Read-only endpoints: replica-routed sessions (plain primary ones without replicas)
+ReadSessionLocal = async_sessionmaker(
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False
+) if DATABASE_REPLICA_URLS else AsyncSessionLocal
+
+
+# ✅ Async DB Dependencies
+async def get_db() -> AsyncSession:
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def get_read_db() -> AsyncSession:
+    async with ReadSessionLocal() as session:
+        yield session
+
+
 # ✅ Async-compatible Base
 class Base(AsyncAttrs, DeclarativeBase):
     pass
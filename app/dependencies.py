@@ -1,34 +1,32 @@
 import logging
-import os
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, Header
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from jose import JWTError, ExpiredSignatureError
 
-from app.database import AsyncSessionLocal
-from app.auth import decode_access_token
+from app.database import get_db
+from app.auth import decode_access_token, InvalidToken, TokenExpired
 from app.models import User
-from app.crud import get_user_by_username
+from app.crud import get_user_by_id, get_token_state
+from app.cache import principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-DEBUG = os.getenv("DEBUG", "true").lower() == "true"
-
-logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# ✅ Async DB Dependency
-async def get_db() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
-        yield session
+# ✅ Lightweight authenticated identity (no ORM row, no links)
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
 
 
-# ✅ Async Current User Dependency
-async def get_current_user(
+# ✅ Async Current Principal Dependency (stateless fast path)
+async def get_current_principal(
     authorization: str = Header(None), db: AsyncSession = Depends(get_db)
-):
+) -> Principal:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=401, detail="Missing or invalid Authorization header"
@@ -37,22 +35,42 @@ async def get_current_user(
     token = authorization[7:]
     try:
         payload = decode_access_token(token)
-        username = payload.get("sub")
-        if not username:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
+    except TokenExpired:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except InvalidToken:
+        raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = await get_user_by_username(db, username)
-        if not user:
+    user_id = payload.get("uid")
+    state = principal_cache.get(user_id) if user_id is not None else None
+    if state is None:
+        try:
+            # Tokens issued before uid/tv claims existed only carry the username
+            row = await get_token_state(db, user_id=user_id, username=payload.get("sub"))
+        except Exception as e:
+            logger.error(f"Unexpected error loading token state: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Internal server error")
+        if not row:
             raise HTTPException(status_code=401, detail="User not found")
+        user_id = row.id
+        state = (row.username, row.token_version)
+        principal_cache.set(user_id, state)
 
-        return user
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    except Exception as e:
-        logger.error(f"Unexpected error in token decode or DB: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
+    username, token_version = state
+    if payload.get("tv", 0) != token_version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    return Principal(id=user_id, username=username)
+
+
+# ✅ Async Current User Dependency (full ORM row with links, for /me)
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    user = await get_user_by_id(db, principal.id, with_links=True)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
 
 
 # async def get_current_user(
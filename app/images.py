@@ -0,0 +1,101 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import AVATAR_SIZES, AVATAR_FORMATS, AVATAR_MAX_PIXELS, IMAGE_WORKERS
+
+ENCODER_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "avif": {"format": "AVIF", "quality": 60, "speed": 8},
+}
+
+Variants = Dict[Tuple[str, int], bytes]
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def supported_formats(formats: Sequence[str] = AVATAR_FORMATS) -> Tuple[str, ...]:
+    from PIL import features
+
+    return tuple(fmt for fmt in formats if fmt in ENCODER_OPTIONS and features.check(fmt))
+
+
+def variant_sizes(width: int, height: int, sizes: Sequence[int]) -> List[int]:
+    """Never upscale: small uploads collapse onto their own size."""
+    side = min(width, height, max(sizes))
+    return sorted({min(size, side) for size in sizes}, reverse=True)
+
+
+def plan_variants(path: str, sizes: Sequence[int] = AVATAR_SIZES) -> List[int]:
+    """Reads only the image header to work out which sizes render_variants will emit."""
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = AVATAR_MAX_PIXELS
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e)) from e
+    return variant_sizes(width, height, sizes)
+
+
+def render_variants(path: str, sizes: Sequence[int], formats: Sequence[str]) -> Variants:
+    """
+    Decodes the image once and encodes a square thumbnail per size/format.
+    Runs inside a worker process, so it only takes and returns plain data.
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = AVATAR_MAX_PIXELS
+    largest = max(sizes)
+    try:
+        with Image.open(path) as image:
+            # JPEG can decode straight at a reduced scale
+            image.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e)) from e
+
+    targets = variant_sizes(*image.size, sizes)
+    side = targets[0]
+    base = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+
+    variants = {}
+    for size in targets:
+        thumbnail = base if size == side else base.resize((size, size), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            out = io.BytesIO()
+            thumbnail.save(out, **ENCODER_OPTIONS[fmt])
+            variants[(fmt, size)] = out.getvalue()
+    return variants
+
+
+_executor = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_image_workers() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def render_avatar_variants(path: str) -> Variants:
+    args = (path, AVATAR_SIZES, supported_formats())
+    if IMAGE_WORKERS <= 0:
+        return await run_in_threadpool(render_variants, *args)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), render_variants, *args)
+
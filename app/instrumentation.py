@@ -0,0 +1,147 @@
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import SLOW_REQUEST_SECONDS, SLOW_QUERY_SECONDS
+from .metrics import registry
+
+logger = logging.getLogger("app.perf")
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames from these files are plumbing, not call sites
+SKIP_FILES = {os.path.join(APP_DIR, name) for name in ("database.py", "instrumentation.py")}
+
+STATEMENT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 100)
+
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route", ["method", "route", "status"]
+)
+request_statements = registry.histogram(
+    "http_request_sql_statements", "SQL statements executed per request", ["method", "route"],
+    buckets=STATEMENT_BUCKETS,
+)
+request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL per request", ["method", "route"]
+)
+slow_requests = registry.counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS", ["method", "route"]
+)
+slow_queries = registry.counter(
+    "db_slow_queries_total", "Statements slower than SLOW_QUERY_SECONDS"
+)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    bcrypt_seconds: float = 0.0
+    upload_seconds: float = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def call_site() -> str:
+    """
+    First frame inside app/ outside the DB plumbing. SQLAlchemy's async layer
+    runs cursor events in a child greenlet, so the walk continues into the
+    parent greenlet's suspended stack, where the awaiting crud code lives.
+    """
+    frame = sys._getframe(1)
+    try:
+        import greenlet
+        current = greenlet.getcurrent()
+    except ImportError:
+        current = None
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(APP_DIR) and filename not in SKIP_FILES:
+            return f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+        if frame is None and current is not None and current.parent is not None:
+            current = current.parent
+            frame = current.gr_frame
+    return "unknown"
+
+
+def record_statement(statement: str, elapsed: float) -> None:
+    """Called from the engine's after_cursor_execute hook."""
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        slow_queries.inc()
+        logger.warning(
+            "Slow query %.1fms at %s: %s",
+            elapsed * 1000, call_site(), " ".join(statement.split())[:500],
+        )
+
+
+def record_bcrypt(elapsed: float) -> None:
+    stats = current_request.get()
+    if stats is not None:
+        stats.bcrypt_seconds += elapsed
+
+
+def record_upload(elapsed: float) -> None:
+    stats = current_request.get()
+    if stats is not None:
+        stats.upload_seconds += elapsed
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounts (e.g. /media) only leave their prefix behind
+    if scope.get("root_path"):
+        return scope["root_path"] + "/{path}"
+    return "unmatched"
+
+
+class InstrumentationMiddleware:
+    """Per-route latency, statement count and DB time, plus a slow request log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            method, route = scope["method"], route_label(scope)
+            request_seconds.observe(elapsed, method=method, route=route, status=str(status))
+            request_statements.observe(stats.statements, method=method, route=route)
+            request_db_seconds.observe(stats.db_seconds, method=method, route=route)
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                slow_requests.inc(method=method, route=route)
+                endpoint = scope.get("endpoint")
+                logger.warning(
+                    "Slow request %s %s (%s -> %s) %d in %.1fms: %d statements, db %.1fms, "
+                    "bcrypt %.1fms, upload %.1fms",
+                    method, scope["path"], route, getattr(endpoint, "__qualname__", "-"), status,
+                    elapsed * 1000, stats.statements, stats.db_seconds * 1000,
+                    stats.bcrypt_seconds * 1000, stats.upload_seconds * 1000,
+                )
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from .config import (
+    JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_DELAY, JOB_RETRY_MAX_DELAY,
+    JOB_CONCURRENCY, JOB_SHUTDOWN_TIMEOUT, JOB_RETENTION_HOURS
+)
+from .crud import create_job, claim_jobs, finish_job, job_pending, prune_jobs
+from .database import AsyncSessionLocal
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# A lease outlives the handler's timeout by this much, so only a dead worker loses it
+LEASE_MARGIN_SECONDS = 30
+PRUNE_INTERVAL_SECONDS = 3600
+
+job_seconds = registry.histogram(
+    "job_seconds", "Background job run time by type", ["type"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+jobs_finished = registry.counter(
+    "jobs_finished_total", "Job runs by type and outcome (succeeded, retried, failed)", ["type", "outcome"]
+)
+jobs_running = registry.gauge("jobs_running", "Jobs running in this process", ["type"])
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobFailed(Exception):
+    """Raised by a handler for errors that retrying will not fix."""
+
+
+class JobType:
+    def __init__(self, name: str, handler: Callable[..., Awaitable], concurrency: int,
+                 max_attempts: int, timeout: float, every: Optional[float]):
+        self.name = name
+        self.handler = handler
+        self.concurrency = JOB_CONCURRENCY.get(name, concurrency)
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.every = every
+
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def job_handler(name: str, concurrency: int = 4, max_attempts: int = JOB_MAX_ATTEMPTS, timeout: float = 60,
+                every: Optional[float] = None):
+    """
+    Registers `async def handler(job)` for a job type. The handler gets the
+    claimed row (payload, user_id, attempts), opens its own sessions and
+    returns a JSON-able result. Any exception is retried with backoff, except
+    JobFailed.
+
+    Recurring types (`every` seconds) are queued when a worker starts and
+    again after each run, right away if the result says {"backlog": true}.
+    """
+    def register(handler):
+        JOB_TYPES[name] = JobType(name, handler, concurrency, max_attempts, timeout, every)
+        return handler
+    return register
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1), JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobWorker:
+    """
+    Claims due jobs from the database and runs them as tasks, at most
+    `concurrency` per type in this process. Polls every JOB_POLL_INTERVAL
+    seconds, or right away when a job is enqueued here or a slot frees up.
+    """
+
+    def __init__(self):
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.running: Dict[str, Set[asyncio.Task]] = {}
+        self.pruned_at = 0.0
+
+    def notify(self) -> None:
+        self.wakeup.set()
+
+    def busy(self, job_type: str) -> int:
+        return len(self.running.get(job_type, ()))
+
+    async def run(self, interval: float) -> None:
+        for spec in list(JOB_TYPES.values()):
+            if spec.every is not None:
+                await self.schedule(spec, 0, statuses=("queued", "running"))
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.dispatch()
+                await self.prune()
+            except Exception as e:
+                logger.error(f"Job polling failed: {e}")
+
+    async def dispatch(self) -> int:
+        started = 0
+        for spec in list(JOB_TYPES.values()):
+            free = spec.concurrency - self.busy(spec.name)
+            if free <= 0:
+                continue
+            for job in await self.claim(spec, free):
+                self.spawn(spec, job)
+                started += 1
+        return started
+
+    async def claim(self, spec: JobType, limit: int, job_id: int = None):
+        now = utcnow()
+        lease = now + timedelta(seconds=spec.timeout + LEASE_MARGIN_SECONDS)
+        async with AsyncSessionLocal() as db:
+            return await claim_jobs(db, spec.name, limit, now, lease, job_id=job_id)
+
+    def spawn(self, spec: JobType, job) -> None:
+        task = asyncio.create_task(self.execute(spec, job))
+        tasks = self.running.setdefault(spec.name, set())
+        tasks.add(task)
+        jobs_running.set(len(tasks), type=spec.name)
+
+        def done(task):
+            tasks.discard(task)
+            jobs_running.set(len(tasks), type=spec.name)
+            self.wakeup.set()
+
+        task.add_done_callback(done)
+
+    async def execute(self, spec: JobType, job) -> None:
+        """Runs one claimed job and records the outcome (never raises, except on cancellation)."""
+        if job.attempts > job.max_attempts:
+            # Its lease ran out on every try: the worker died while running it
+            await self.finish(spec, job, "failed", error="Worker lost the job too many times")
+            return
+
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(spec.handler(job), spec.timeout)
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back untouched for the next worker
+            async with AsyncSessionLocal() as db:
+                await finish_job(db, job.id, "queued", run_at=utcnow(), attempts=job.attempts - 1)
+            raise
+        except JobFailed as e:
+            await self.finish(spec, job, "failed", error=str(e))
+        except Exception as e:
+            error = f"Timed out after {spec.timeout:.0f}s" if isinstance(e, asyncio.TimeoutError) else repr(e)
+            if job.attempts < job.max_attempts:
+                logger.warning(f"Job {job.id} ({spec.name}) failed, attempt {job.attempts}: {error}")
+                run_at = utcnow() + timedelta(seconds=retry_delay(job.attempts))
+                await self.finish(spec, job, "queued", error=error, run_at=run_at)
+            else:
+                logger.error(f"Job {job.id} ({spec.name}) failed for good: {error}")
+                await self.finish(spec, job, "failed", error=error)
+        else:
+            await self.finish(spec, job, "succeeded", result=result)
+        finally:
+            job_seconds.observe(time.perf_counter() - started, type=spec.name)
+
+    async def finish(self, spec: JobType, job, status: str, **outcome) -> None:
+        finished_at = None if status == "queued" else utcnow()
+        try:
+            async with AsyncSessionLocal() as db:
+                await finish_job(db, job.id, status, finished_at=finished_at, **outcome)
+        except Exception as e:
+            # The lease expires and another run picks the job up
+            logger.error(f"Could not record job {job.id} as {status}: {e}")
+        jobs_finished.inc(type=spec.name, outcome="retried" if status == "queued" else status)
+        if spec.every is not None and status != "queued":
+            result = outcome.get("result")
+            backlog = isinstance(result, dict) and result.get("backlog")
+            await self.schedule(spec, 0 if backlog else spec.every)
+
+    async def schedule(self, spec: JobType, delay: float, statuses=("queued",)) -> None:
+        """Queues the next run of a recurring job unless one is already waiting."""
+        try:
+            async with AsyncSessionLocal() as db:
+                if await job_pending(db, spec.name, statuses):
+                    return
+                run_at = utcnow() + timedelta(seconds=delay)
+                await create_job(db, spec.name, {}, spec.max_attempts, run_at)
+        except Exception as e:
+            logger.error(f"Could not schedule {spec.name}: {e}")
+            return
+        self.wakeup.set()
+
+    async def run_now(self, job_type: str, job_id: int) -> bool:
+        """Claims and runs one job in the caller's task (no background workers here)."""
+        spec = JOB_TYPES[job_type]
+        jobs = await self.claim(spec, 1, job_id=job_id)
+        for job in jobs:
+            await self.execute(spec, job)
+        return bool(jobs)
+
+    async def prune(self) -> None:
+        if time.monotonic() - self.pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self.pruned_at = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            deleted = await prune_jobs(db, utcnow() - timedelta(hours=JOB_RETENTION_HOURS))
+        if deleted:
+            logger.info(f"Pruned {deleted} finished job(s)")
+
+    def start(self, interval: float = JOB_POLL_INTERVAL) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(interval))
+
+    async def stop(self, timeout: float = JOB_SHUTDOWN_TIMEOUT) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        tasks = [task for tasks in self.running.values() for task in tasks]
+        if tasks:
+            # Let running jobs finish; whatever is left goes back to the queue
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+job_worker = JobWorker()
+
+
+async def enqueue(db, job_type: str, payload: dict, user_id: int = None, delay: float = 0) -> int:
+    """
+    Stores a job and returns its id. Local workers are woken up at once. When
+    this process runs no worker (JOB_WORKERS_ENABLED=false, or no lifespan),
+    the job runs right here before returning.
+    """
+    spec = JOB_TYPES[job_type]
+    job_id = await create_job(
+        db, job_type, payload, spec.max_attempts, utcnow() + timedelta(seconds=delay), user_id=user_id
+    )
+    if job_worker.task is not None:
+        job_worker.notify()
+    elif not delay:
+        await job_worker.run_now(job_type, job_id)
+    return job_id
+
+
+async def main():
+    """Standalone worker: `python -m app.jobs`."""
+    import app.main  # noqa: F401  registers every job handler
+
+    logging.basicConfig(level=logging.INFO)
+    job_worker.start()
+    logger.info(f"Job worker running: {', '.join(sorted(JOB_TYPES))}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_worker.stop()
+
+
+if __name__ == "__main__":
+    # Run the app.jobs module, not this __main__ copy with its own registry
+    from app.jobs import main as run_worker
+
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
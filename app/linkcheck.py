@@ -0,0 +1,324 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin, urlsplit
+
+from .cache import TTLCache
+from .config import (
+    LINKCHECK_ENABLED, LINKCHECK_INTERVAL, LINKCHECK_BATCH_SIZE, LINKCHECK_RECHECK_HOURS,
+    LINKCHECK_TIMEOUT, LINKCHECK_MAX_REDIRECTS, LINKCHECK_MAX_CONNECTIONS, LINKCHECK_PER_HOST,
+    LINKCHECK_MAX_BYTES, LINKCHECK_CACHE_TTL, LINKCHECK_CACHE_MAX_ENTRIES, LINKCHECK_USER_AGENT,
+    LINKCHECK_ALLOW_PRIVATE
+)
+from .crud import claim_links_for_check, record_link_checks
+from .database import AsyncSessionLocal
+from .jobs import job_handler, utcnow
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# Unreachable and 5xx results are retried sooner than healthy ones
+FAILURE_CACHE_TTL = 60
+MAX_TITLE_LENGTH = 300
+
+linkcheck_seconds = registry.histogram(
+    "linkcheck_seconds", "Time to inspect one URL (redirects included, cache misses only)"
+)
+links_checked = registry.counter(
+    "links_checked_total", "Link inspections by outcome (ok, broken = 4xx/5xx, error = unreachable)", ["outcome"]
+)
+
+
+class Inspection(NamedTuple):
+    http_status: Optional[int] = None
+    final_url: Optional[str] = None
+    favicon_url: Optional[str] = None
+    og_title: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def outcome(self) -> str:
+        if self.http_status is None:
+            return "error"
+        return "broken" if self.http_status >= 400 else "ok"
+
+
+class BlockedURL(ValueError):
+    pass
+
+
+class HeadParser(HTMLParser):
+    """Collects og:title, <title> and icon links; stops caring after </head>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.og_title: Optional[str] = None
+        self.title: Optional[str] = None
+        self.icons: List[str] = []
+        self.done = False
+        self._title_parts: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key == "og:title" and attrs.get("content") and self.og_title is None:
+                self.og_title = attrs["content"].strip()
+        elif tag == "link" and attrs.get("href") and "icon" in attrs.get("rel", "").lower().split():
+            self.icons.append(attrs["href"])
+        elif tag == "title":
+            self._title_parts = []
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._title_parts is not None:
+            self.title = self.title or " ".join("".join(self._title_parts).split())
+            self._title_parts = None
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+
+def origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class LinkInspector:
+    """
+    Fetches a URL's status, redirect target, favicon and title. One shared
+    httpx client (created on first use) keeps connections warm; requests are
+    bounded per host and per process, and results are cached per URL, with
+    concurrent checks of the same URL sharing one fetch.
+    """
+
+    def __init__(
+        self,
+        timeout: float = LINKCHECK_TIMEOUT,
+        max_connections: int = LINKCHECK_MAX_CONNECTIONS,
+        per_host: int = LINKCHECK_PER_HOST,
+        cache_ttl: float = LINKCHECK_CACHE_TTL,
+        allow_private: bool = LINKCHECK_ALLOW_PRIVATE,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.allow_private = allow_private
+        self.client = None
+        self.slots = asyncio.Semaphore(max_connections)
+        # host -> [semaphore, users]; dropped when the last user leaves
+        self.hosts: Dict[str, list] = {}
+        self.results = TTLCache(LINKCHECK_CACHE_MAX_ENTRIES, cache_ttl)
+        self.favicons = TTLCache(LINKCHECK_CACHE_MAX_ENTRIES, cache_ttl)
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_client(self):
+        if self.client is None:
+            import httpx
+
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+                ),
+                headers={"User-Agent": LINKCHECK_USER_AGENT, "Accept": "text/html,*/*;q=0.8"},
+                follow_redirects=False,
+            )
+        return self.client
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    @asynccontextmanager
+    async def host_slot(self, host: str):
+        entry = self.hosts.get(host)
+        if entry is None:
+            entry = self.hosts[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self.slots:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.hosts[host]
+
+    async def ensure_public(self, url: str) -> None:
+        """
+        Refuses non-HTTP URLs and hosts resolving to private, loopback or
+        link-local addresses. (httpx resolves again when it connects, so this
+        narrows rather than closes the DNS-rebinding window.)
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise BlockedURL("Unsupported URL")
+        if self.allow_private:
+            return
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+            )
+        except socket.gaierror:
+            raise BlockedURL("Host not found")
+        for info in infos:
+            address = ipaddress.ip_address(info[4][0].split("%")[0])
+            if not address.is_global:
+                raise BlockedURL("Blocked address")
+
+    async def request(self, url: str, read_html: bool = True):
+        """One GET; returns (status, Location, html head or None, content type)."""
+        # httpx timeouts are per read, so a slow-drip server also gets a deadline
+        return await asyncio.wait_for(self._request(url, read_html), self.timeout * 2)
+
+    async def _request(self, url: str, read_html: bool):
+        async with self.get_client().stream("GET", url) as response:
+            content_type = response.headers.get("content-type", "")
+            html = None
+            if read_html and response.status_code < 300 and "html" in content_type:
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) >= LINKCHECK_MAX_BYTES or b"</head>" in body[-len(chunk) - 7:].lower():
+                        break
+                html = bytes(body[:LINKCHECK_MAX_BYTES]).decode(response.encoding or "utf-8", errors="replace")
+            return response.status_code, response.headers.get("location"), html, content_type
+
+    async def fetch(self, url: str) -> Inspection:
+        current = url
+        for _ in range(LINKCHECK_MAX_REDIRECTS + 1):
+            await self.ensure_public(current)
+            async with self.host_slot(urlsplit(current).netloc):
+                status, location, html, _ = await self.request(current)
+            if status in REDIRECT_STATUSES and location:
+                current = urljoin(current, location)
+                continue
+            break
+        else:
+            return Inspection(status, current, error="Too many redirects")
+
+        title, favicon = None, None
+        if html is not None:
+            parser = HeadParser()
+            parser.feed(html)
+            title = (parser.og_title or parser.title or "")[:MAX_TITLE_LENGTH] or None
+            if parser.icons:
+                favicon = urljoin(current, parser.icons[0])
+        if favicon is None and status < 400:
+            favicon = await self.default_favicon(current)
+        return Inspection(status, current, favicon, title)
+
+    async def default_favicon(self, url: str) -> Optional[str]:
+        """/favicon.ico of the site if it serves one; cached per origin."""
+        site = origin(url)
+        favicon = self.favicons.get(site)
+        if favicon is None:
+            favicon = ""
+            try:
+                async with self.host_slot(urlsplit(site).netloc):
+                    status, _, _, content_type = await self.request(f"{site}/favicon.ico", read_html=False)
+                if status == 200 and content_type.startswith("image/"):
+                    favicon = f"{site}/favicon.ico"
+            except Exception:
+                pass
+            self.favicons.set(site, favicon)
+        return favicon or None
+
+    async def check(self, url: str) -> Inspection:
+        started = time.perf_counter()
+        try:
+            return await self.fetch(url)
+        except BlockedURL as e:
+            return Inspection(error=str(e))
+        except Exception as e:
+            name = type(e).__name__
+            return Inspection(error="Timed out" if "Timeout" in name else f"Unreachable ({name})")
+        finally:
+            linkcheck_seconds.observe(time.perf_counter() - started)
+
+    async def inspect(self, url: str) -> Inspection:
+        cached = self.results.get(url)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        pending = self.inflight.get(url)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[url] = future
+        try:
+            result = await self.check(url)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self.inflight[url]
+        future.set_result(result)
+        healthy = result.http_status is not None and result.http_status < 500
+        self.results.set(url, result, ttl=None if healthy else FAILURE_CACHE_TTL)
+        links_checked.inc(outcome=result.outcome)
+        return result
+
+
+inspector = LinkInspector()
+
+registry.add_collector(lambda: [
+    ("linkcheck_cache_hits_total", "counter", "Link inspections served from cache", inspector.hits),
+    ("linkcheck_cache_misses_total", "counter", "Link inspections that hit the network", inspector.misses),
+    ("linkcheck_hosts_active", "gauge", "Hosts with link checks in flight", len(inspector.hosts)),
+])
+
+
+# === Recurring sweep: new links first, then the stalest ===
+LINKCHECK_JOB = "linkcheck"
+
+
+@job_handler(
+    LINKCHECK_JOB, concurrency=1, max_attempts=1, timeout=600,
+    every=LINKCHECK_INTERVAL if LINKCHECK_ENABLED else None,
+)
+async def check_due_links(job) -> dict:
+    now = utcnow()
+    async with AsyncSessionLocal() as db:
+        links = await claim_links_for_check(
+            db, LINKCHECK_BATCH_SIZE, now - timedelta(hours=LINKCHECK_RECHECK_HOURS), now
+        )
+    if not links:
+        return {"checked": 0}
+
+    inspections = await asyncio.gather(*(inspector.inspect(url) for _, url in links))
+    results = {
+        link_id: {
+            "http_status": inspection.http_status,
+            "final_url": inspection.final_url,
+            "favicon_url": inspection.favicon_url,
+            "og_title": inspection.og_title,
+            "check_error": inspection.error,
+            "checked_at": now,
+        }
+        for (link_id, _), inspection in zip(links, inspections)
+    }
+    async with AsyncSessionLocal() as db:
+        changed = await record_link_checks(db, results, dict(links))
+    broken = sum(inspection.outcome != "ok" for inspection in inspections)
+    logger.info(f"Checked {len(links)} link(s): {broken} broken or unreachable, {changed} profile(s) changed")
+    return {"checked": len(links), "broken": broken, "backlog": len(links) == LINKCHECK_BATCH_SIZE}
@@ -1,96 +1,112 @@
 import os
-import uuid
 import logging
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import List, Literal, Optional
 
 from fastapi import (
-    FastAPI, Depends, HTTPException, status, Header,
-    UploadFile, File, Form, Request
+    FastAPI, APIRouter, Depends, HTTPException, status, Header,
+    UploadFile, File, Form, Request, Query, Body
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, PlainTextResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from dotenv import load_dotenv
-import filetype
-
-# 🛡️ Rate limiting
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-# 🌩️ Cloudinary
-import cloudinary
-import cloudinary.uploader
 
 from app import models, schemas
 from app.schemas import (
     ProfileOut, Token, UserCreate, UserLogin,
-    LinkCreate, LinkOut, LinkUpdate,
-    UserOut, UserUpdate
+    LinkCreate, LinkOut, LinkUpdate, LinkBatchUpdate,
+    UserOut, UserUpdate, LinkClicks, ProfileStats, SearchResults, JobOut
 )
 from app.crud import (
-    get_user_by_username, create_user, authenticate_user, get_user_links,
+    get_user_by_username, get_user_by_id, create_user, authenticate_user,
     get_links_by_user_id, get_link_by_id, create_link, update_link, delete_link,
-    update_user_profile
+    create_links, update_links, delete_links,
+    update_user_profile, get_public_profile, get_profile_head, revoke_user_tokens,
+    get_link_url, get_link_clicks, get_profile_view_range, search_users, search_links,
+    create_search_index, get_job, get_jobs_by_user_id
 )
-from app.auth import create_access_token, decode_access_token
-from app.database import async_engine, AsyncSessionLocal
-from app.dependencies import get_current_user
-
-# === Load Environment Variables ===
-load_dotenv()
-
-DEBUG = os.getenv("DEBUG", "true").lower() == "true"
-USE_CLOUDINARY = not DEBUG
-PORT = int(os.getenv("PORT", 8000))
-CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
-
-# === Media Setup ===
-MEDIA_DIR = "media"
-AVATAR_DIR = os.path.join(MEDIA_DIR, "avatars")
-if DEBUG and not USE_CLOUDINARY:
-    os.makedirs(AVATAR_DIR, exist_ok=True)
-
-if USE_CLOUDINARY:
-    cloudinary.config(
-        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-        api_key=os.getenv("CLOUDINARY_API_KEY"),
-        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-        secure=True
-    )
-
-# === Logging ===
-logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
-logger = logging.getLogger(__name__)
-
-# === FastAPI App ===
-limiter = Limiter(key_func=get_remote_address)
-
-app = FastAPI(
-    title="Link-in-Bio API",
-    version="1.0.0",
-    description="API backend for Link-in-Bio app"
+from app.auth import (
+    create_access_token, decode_access_token, PasswordHasherBusy,
+    password_hasher, verified_tokens, password_context, jwt_module
+)
+from app.database import (
+    AsyncSessionLocal, get_db, get_read_db, read_your_writes, recently_written, on_replica, replicas,
+    get_engine, dispose_engine
+)
+from app.cache import profile_cache, link_targets, make_etag, etag_matches
+from app.clicks import click_buffer, hour_bucket
+from app.analytics import profile_views, HyperLogLog, summarize, today
+from app.config import (
+    DEBUG, CORS_ORIGINS, PRELOAD_ON_STARTUP, STORAGE_BACKEND, MEDIA_DIR, AVATAR_DIR,
+    MAX_REQUEST_BODY_BYTES, METRICS_ENABLED, METRICS_TOKEN, LINK_BATCH_MAX_SIZE, ANALYTICS_MAX_DAYS,
+    RATE_LIMIT_REGISTER, RATE_LIMIT_LOGIN, RATE_LIMIT_LOGIN_PER_USER, RATE_LIMIT_LOGIN_PER_ACCOUNT,
+    JOB_WORKERS_ENABLED,
+    CLICK_BUFFER_ENABLED, ANALYTICS_BUFFER_ENABLED
+)
+from app.metrics import registry
+from app.pagination import MAX_PAGE_SIZE, InvalidCursor, decode_cursor, split_page
+from app.dependencies import get_current_user, get_current_principal, Principal
+from app.ratelimit import (
+    RateLimitExceeded, Rate, limiter, public_rate_limit, client_ip, retry_after_header
 )
+from app.instrumentation import InstrumentationMiddleware
+from app.responses import CompressionMiddleware, json_bytes, model_response
+from app.uploads import MaxBodySizeMiddleware, queue_avatar
+from app.jobs import job_worker
+from app.linkcheck import inspector
+from app.media import MediaFiles
+from app.images import shutdown_image_workers
+from app.storage import close_storage
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+logger = logging.getLogger(__name__)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
+
+# === Startup / Shutdown ===
+def preload():
+    """Pays the lazy-initialization costs before the first request arrives."""
+    get_engine()
+    password_context()
+    jwt_module()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRELOAD_ON_STARTUP:
+        preload()
+    # 🔎 SQLite's FTS5 search tables (Postgres gets its indexes from migrations)
+    await create_search_index()
+    if CLICK_BUFFER_ENABLED:
+        click_buffer.start()
+    if ANALYTICS_BUFFER_ENABLED:
+        profile_views.start()
+    if JOB_WORKERS_ENABLED:
+        job_worker.start()
+    replicas.start()
+    yield
+    await replicas.stop()
+    await job_worker.stop()
+    await inspector.close()
+    await click_buffer.stop()
+    await profile_views.stop()
+    shutdown_image_workers()
+    await close_storage()
+    await dispose_engine()
 
-if DEBUG and not USE_CLOUDINARY:
-    app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+# 🛡️ Rate limiting
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests"},
+        headers={"Retry-After": retry_after_header(exc)},
+    )
 
-# === Dependency: Async DB Session ===
-async def get_db() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
-        yield session
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
 # === Dependency: Current Authenticated User ===
 # async def get_current_user(
@@ -119,120 +135,262 @@ async def get_db() -> AsyncSession:
 #         raise HTTPException(status_code=401, detail="Invalid token")
 
 # === Auth Endpoints ===
-@app.post("/register", response_model=Token)
-@limiter.limit("5/minute")
+def issue_access_token(user: models.User) -> str:
+    return create_access_token(
+        {"sub": user.username, "uid": user.id, "tv": user.token_version}
+    )
+
+REGISTER_RATE = Rate.parse(RATE_LIMIT_REGISTER)
+LOGIN_RATE = Rate.parse(RATE_LIMIT_LOGIN)
+LOGIN_PER_USER_RATE = Rate.parse(RATE_LIMIT_LOGIN_PER_USER)
+LOGIN_PER_ACCOUNT_RATE = Rate.parse(RATE_LIMIT_LOGIN_PER_ACCOUNT)
+
+@router.post("/register", response_model=Token)
 async def register(user: UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
-    if await get_user_by_username(db, user.username):
+    await limiter.hit("register", REGISTER_RATE, f"ip:{client_ip(request)}")
+    if await get_user_by_username(db, user.username, models.User.id):
         raise HTTPException(
             status_code=400, detail="Username already registered")
     user_obj = await create_user(db, user)
-    token = create_access_token({"sub": user_obj.username})
+    token = issue_access_token(user_obj)
     return {"access_token": token, "token_type": "bearer"}
 
-@app.post("/login", response_model=Token)
-@limiter.limit("10/minute")
+@router.post("/login", response_model=Token)
 async def login(form: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
+    ip = client_ip(request)
+    await limiter.hit("login", LOGIN_RATE, f"ip:{ip}")
+    # Only failures are charged: per username and IP, so one guesser cannot lock
+    # the owner out, and a looser per-username budget for guesses spread over IPs
+    account = f"user:{form.username.lower()}"
+    guesser = f"{account}:ip:{ip}"
+    await limiter.hit("login-user", LOGIN_PER_USER_RATE, guesser, cost=0)
+    await limiter.hit("login-account", LOGIN_PER_ACCOUNT_RATE, account, cost=0)
     user = await authenticate_user(db, form.username, form.password)
     if not user:
+        await limiter.hit("login-user", LOGIN_PER_USER_RATE, guesser)
+        await limiter.hit("login-account", LOGIN_PER_ACCOUNT_RATE, account)
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token({"sub": user.username})
+    token = issue_access_token(user)
     return {"access_token": token, "token_type": "bearer"}
 
-# === Link Endpoints ===
-@app.get("/users/{username}/links", response_model=List[LinkOut])
-async def list_user_links(username: str, limit: int = 10, offset: int = 0, db: AsyncSession = Depends(get_db)):
-    return await get_user_links(db, username, limit, offset)
+@router.post("/logout")
+async def logout(user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    # Revokes every token issued to the user so far
+    await revoke_user_tokens(db, user.id)
+    return {"detail": "Logged out"}
+
+# === Public Snapshots (ETag / If-None-Match) ===
+async def get_cached_profile_head(db: AsyncSession, username: str):
+    head = await profile_cache.get_head(username)
+    if head is None:
+        since = await profile_cache.clock()
+        row = await get_profile_head(db, username)
+        # 🔁 The owner just wrote: ask the primary, the replica may not have it yet
+        if row is not None and await read_your_writes(db, row.id):
+            row = await get_profile_head(db, username)
+        if row is None:
+            return None
+        head = (row.id, row.version)
+        # A replica's copy is cached only if the owner has not written since
+        if not on_replica(db) or not await recently_written(row.id):
+            await profile_cache.set_head(username, *head, since)
+    else:
+        await read_your_writes(db, head[0])
+    return head
+
+def snapshot_response(body: Optional[bytes], etag: str, headers: Optional[dict] = None) -> Response:
+    # Vary on 304s too: CompressionMiddleware only sees the 200s' content type
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache", "Vary": "Accept-Encoding", **(headers or {})}
+    if body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# === Link Pagination ===
+async def fetch_links_page(db: AsyncSession, user_id: int, limit: int, offset: int, cursor: Optional[str]):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, 2)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await get_links_by_user_id(db, user_id, limit + 1, offset, after)
+    return split_page(rows, limit, key=lambda link: (link.position, link.id))
 
-@app.get("/links", response_model=List[LinkOut])
-async def get_my_links(user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    return await get_links_by_user_id(db, user.id)
+def next_cursor_headers(next_cursor: Optional[str]) -> dict:
+    return {"X-Next-Cursor": next_cursor} if next_cursor else {}
 
-@app.post("/links", response_model=LinkOut)
-async def add_link(link: LinkCreate, user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    return await create_link(db, user.id, link)
+# === Link Endpoints ===
+@router.get("/users/{username}/links", response_model=List[LinkOut], dependencies=[Depends(public_rate_limit)])
+async def list_user_links(
+    username: str,
+    limit: int = Query(10, ge=1),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if limit > MAX_PAGE_SIZE:
+        # Old offset clients had no cap: clamp theirs, reject it with a cursor
+        if cursor:
+            raise HTTPException(status_code=422, detail=f"limit must be at most {MAX_PAGE_SIZE}")
+        limit = MAX_PAGE_SIZE
+    head = await get_cached_profile_head(db, username)
+    if head is None:
+        return []
+
+    user_id, version = head
+    variant = f"links:{limit}:{offset}:{cursor or ''}"
+    etag = make_etag(user_id, version, variant)
+    if etag_matches(if_none_match, etag):
+        return snapshot_response(None, etag)
+
+    snapshot = await profile_cache.get_snapshot(username, version, variant)
+    if snapshot is None:
+        links, next_cursor = await fetch_links_page(db, user_id, limit, offset, cursor)
+        body = json_bytes(List[LinkOut], links)
+        snapshot = (body, next_cursor)
+        await profile_cache.set_snapshot(username, version, variant, snapshot)
+
+    body, next_cursor = snapshot
+    return snapshot_response(body, etag, next_cursor_headers(next_cursor))
+
+@router.get("/links", response_model=List[LinkOut])
+async def get_my_links(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    # Without limit or cursor, every link in one response as before pagination
+    if limit is None and cursor is None:
+        return model_response(List[LinkOut], await get_links_by_user_id(db, user.id))
+    links, next_cursor = await fetch_links_page(db, user.id, limit or MAX_PAGE_SIZE, 0, cursor)
+    return model_response(List[LinkOut], links, headers=next_cursor_headers(next_cursor))
+
+@router.post("/links", response_model=LinkOut)
+async def add_link(link: LinkCreate, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    return model_response(LinkOut, await create_link(db, user.id, link))
+
+# === Batch Link Endpoints (declared before /links/{link_id}) ===
+BatchBody = Body(..., min_length=1, max_length=LINK_BATCH_MAX_SIZE)
+
+def ensure_unique_ids(link_ids: List[int]):
+    if len(set(link_ids)) != len(link_ids):
+        raise HTTPException(status_code=400, detail="Duplicate link ids in batch")
+
+@router.post("/links/batch", response_model=List[LinkOut])
+async def add_links_batch(links: List[LinkCreate] = BatchBody, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    return model_response(List[LinkOut], await create_links(db, user.id, links))
+
+@router.put("/links/batch", response_model=List[LinkOut])
+async def edit_links_batch(items: List[LinkBatchUpdate] = BatchBody, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    ensure_unique_ids([item.id for item in items])
+    updated = await update_links(db, user.id, items)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Link not found")
+    return model_response(List[LinkOut], updated)
+
+@router.delete("/links/batch")
+async def delete_links_batch(link_ids: List[int] = BatchBody, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    ensure_unique_ids(link_ids)
+    deleted = await delete_links(db, user.id, link_ids)
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Link not found")
+    return {"detail": "Deleted", "ids": deleted}
 
-@app.get("/links/{link_id}", response_model=LinkOut)
-async def get_single_link(link_id: int, user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@router.get("/links/{link_id}", response_model=LinkOut)
+async def get_single_link(link_id: int, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_read_db)):
+    await read_your_writes(db, user.id)
     link = await get_link_by_id(db, link_id, user.id)
     if not link:
         raise HTTPException(status_code=404, detail="Link not found")
-    return link
+    return model_response(LinkOut, link)
 
-@app.put("/links/{link_id}", response_model=LinkOut)
-async def edit_link(link_id: int, link_data: LinkUpdate, user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@router.put("/links/{link_id}", response_model=LinkOut)
+async def edit_link(link_id: int, link_data: LinkUpdate, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
     updated = await update_link(db, link_id, user.id, link_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Link not found")
-    return updated
+    return model_response(LinkOut, updated)
 
-@app.delete("/links/{link_id}")
-async def delete_user_link(link_id: int, user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+@router.delete("/links/{link_id}")
+async def delete_user_link(link_id: int, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
     deleted = await delete_link(db, link_id, user.id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Link not found")
     return {"detail": "Deleted"}
 
+@router.get("/links/{link_id}/clicks", response_model=LinkClicks)
+async def get_link_click_counts(
+    link_id: int,
+    hours: int = Query(24 * 7, ge=1, le=24 * 90),
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    if not await get_link_by_id(db, link_id, user.id):
+        raise HTTPException(status_code=404, detail="Link not found")
+    since = hour_bucket() - timedelta(hours=hours - 1)
+    counts = {hour: count for hour, count in await get_link_clicks(db, link_id, since)}
+    # Clicks still sitting in this worker's buffer
+    for hour, count in click_buffer.pending(link_id).items():
+        if hour >= since:
+            counts[hour] = counts.get(hour, 0) + count
+    hourly = [{"hour": hour, "count": counts[hour]} for hour in sorted(counts)]
+    return model_response(LinkClicks, {"link_id": link_id, "total": sum(counts.values()), "hourly": hourly})
+
+# === Click-tracking Redirect ===
+@router.get("/r/{link_id}")
+async def follow_link(link_id: int):
+    # ⚡ Hot links never touch the DB: URL from cache, click into the buffer
+    # (written straight away when CLICK_BUFFER_ENABLED is off)
+    url = link_targets.get(link_id)
+    if url is None:
+        async with AsyncSessionLocal() as db:
+            url = await get_link_url(db, link_id)
+        if url is None:
+            raise HTTPException(status_code=404, detail="Link not found")
+        link_targets.set(link_id, url)
+    await click_buffer.click(link_id)
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": "no-store"})
+
 # === Profile Endpoints ===
-@app.get("/me", response_model=UserOut)
+def visitor_id(request: Request) -> str:
+    # Only ever hashed into a sketch, never stored
+    client = request.client.host if request.client else ""
+    return f"{client}|{request.headers.get('user-agent', '')}"
+
+
+@router.get("/me", response_model=UserOut)
 async def get_me(user: models.User = Depends(get_current_user)):
-    return user
+    return model_response(UserOut, user)
 
-@app.patch("/me", response_model=UserOut)
+@router.patch("/me", response_model=UserOut)
 async def update_me(
     bio: Optional[str] = Form(""),
     avatar: Optional[UploadFile] = File(None),
-    user: models.User = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    avatar_url = user.avatar_url
+    if not await get_user_by_id(db, principal.id, models.User.id):
+        raise HTTPException(status_code=401, detail="User not found")
 
+    # ⚡ Resizing and storing the avatar runs as a job; the profile switches
+    # over when it is done (poll the Location header)
+    avatar_job = None
     if avatar:
         try:
-            file_content = await avatar.read()
-            kind = filetype.guess(file_content)
-
-            if not kind or kind.mime not in ["image/png", "image/jpeg"]:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid image format. Only PNG and JPEG allowed."
-                )
-
-            ext = f".{kind.extension}" if kind else ".jpg"
-            filename = f"{user.username}_{uuid.uuid4().hex}{ext}"
-
-            if USE_CLOUDINARY:
-                try:
-                    upload_result = cloudinary.uploader.upload(
-                        file_content,
-                        folder="avatars",
-                        public_id=filename,
-                        resource_type="image"
-                    )
-                    avatar_url = upload_result["secure_url"]
-                except Exception as e:
-                    logger.error(f"Cloudinary upload failed: {e}")
-                    raise HTTPException(status_code=500, detail="Cloudinary upload failed")
-            else:
-                filepath = os.path.join(AVATAR_DIR, filename)
-                try:
-                    with open(filepath, "wb") as buffer:
-                        buffer.write(file_content)
-                    avatar_url = f"/media/avatars/{filename}"
-                except Exception as e:
-                    logger.error(f"Local file save failed: {e}")
-                    raise HTTPException(status_code=500, detail="Failed to save avatar locally")
-
+            avatar_job = await queue_avatar(db, principal.id, avatar)
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Avatar processing failed: {e}")
+            logger.error(f"Avatar upload failed: {e}")
             import traceback
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail="Avatar upload failed")
 
     try:
-        return await update_user_profile(
-            db,
-            user.id,
-            schemas.UserUpdate(bio=bio, avatar_url=avatar_url),
+        updated = await update_user_profile(
+            db, principal.id, schemas.UserUpdate(bio=bio, avatar_url=None)
         )
     except Exception as e:
         logger.error(f"Profile update failed: {e}")
@@ -240,21 +398,180 @@ async def update_me(
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Failed to update profile")
 
+    if avatar_job is None:
+        return model_response(UserOut, updated)
+    return model_response(
+        UserOut, updated, status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/jobs/{avatar_job}"},
+    )
 
-@app.get("/users/{username}", response_model=ProfileOut)
-async def get_user_profile(username: str, db: AsyncSession = Depends(get_db)):
-    user = await get_user_by_username(db, username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    links = await get_links_by_user_id(db, user.id)
-    return {
-        "username": user.username,
-        "bio": user.bio,
-        "avatar_url": user.avatar_url,
-        "links": links
+@router.get("/me/stats", response_model=ProfileStats)
+async def get_my_stats(
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS),
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    since = today() - timedelta(days=days - 1)
+    rollups = {
+        day: (views, HyperLogLog.from_bytes(sketch))
+        for day, views, sketch in await get_profile_view_range(db, user.id, since)
     }
+    # Views still sitting in this worker's buffer
+    for day, (views, sketch) in profile_views.pending_for(user.id).items():
+        if day < since:
+            continue
+        stored_views, stored_sketch = rollups.get(day, (0, HyperLogLog()))
+        rollups[day] = (stored_views + views, HyperLogLog(sketch.registers).merge(stored_sketch))
+    return model_response(ProfileStats, summarize(rollups))
+
+@router.get("/users/{username}", response_model=ProfileOut, dependencies=[Depends(public_rate_limit)])
+async def get_user_profile(
+    username: str,
+    request: Request,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # ⚡ Revalidation and hot profiles never serialize or touch the DB
+    head = await get_cached_profile_head(db, username)
+    if head is None:
+        raise HTTPException(status_code=404, detail="User not found")
 
-@app.get("/")
+    user_id, version = head
+    await profile_views.view(user_id, visitor_id(request))
+    etag = make_etag(user_id, version, "profile")
+    if etag_matches(if_none_match, etag):
+        return snapshot_response(None, etag)
+
+    body = await profile_cache.get_snapshot(username, version, "profile")
+    if body is None:
+        profile = await get_public_profile(db, username)
+        if not profile:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Key the snapshot by the version read together with its content
+        version = profile["version"]
+        etag = make_etag(profile["id"], version, "profile")
+        body = json_bytes(ProfileOut, profile)
+        await profile_cache.set_snapshot(username, version, "profile", body)
+    return snapshot_response(body, etag)
+
+# === Search ===
+@router.get("/search", response_model=SearchResults, dependencies=[Depends(public_rate_limit)])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Literal["users", "links"] = Query("users", alias="type"),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    # Ranked by relevance; the cursor carries the (score, id) of the last hit
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, 2)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    find = search_users if kind == "users" else search_links
+    rows = await find(db, q, limit + 1, after)
+    hits, next_cursor = split_page(rows, limit, key=lambda row: (row.score, row.id))
+    return model_response(SearchResults, {kind: hits}, headers=next_cursor_headers(next_cursor))
+
+# === Background Jobs ===
+@router.get("/jobs", response_model=List[JobOut])
+async def list_my_jobs(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    # Newest first; the cursor carries the id of the last job
+    before = None
+    if cursor:
+        try:
+            (before,) = decode_cursor(cursor, 1)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await get_jobs_by_user_id(db, user.id, limit + 1, before)
+    jobs, next_cursor = split_page(rows, limit, key=lambda job: (job.id,))
+    return model_response(List[JobOut], jobs, headers=next_cursor_headers(next_cursor))
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+async def get_my_job(job_id: int, user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
+    job = await get_job(db, job_id, user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return model_response(JobOut, job)
+
+# === Metrics ===
+@registry.add_collector
+def collect_app_stats():
+    hasher = password_hasher.stats()
+    return [
+        ("profile_cache_hits_total", "counter", "Profile snapshot cache hits", profile_cache.hits),
+        ("profile_cache_misses_total", "counter", "Profile snapshot cache misses", profile_cache.misses),
+        ("token_cache_hits_total", "counter", "Verified token cache hits", verified_tokens.hits),
+        ("token_cache_misses_total", "counter", "Verified token cache misses", verified_tokens.misses),
+        ("password_hash_calls_total", "counter", "bcrypt hash/verify calls", hasher["calls"]),
+        ("password_hash_rejected_total", "counter", "bcrypt calls rejected with 503", hasher["rejected"]),
+        ("password_hash_pending", "gauge", "bcrypt calls queued or running", hasher["pending"]),
+        ("password_hash_wait_seconds_total", "counter", "Time bcrypt calls spent queued", hasher["wait_seconds"]),
+        ("password_hash_seconds_total", "counter", "Time spent in bcrypt", hasher["hash_seconds"]),
+    ]
+
+if METRICS_ENABLED and not (METRICS_TOKEN or DEBUG):
+    # 🔒 Never public in production
+    logger.warning("/metrics is disabled: set METRICS_TOKEN to serve it outside DEBUG")
+elif METRICS_ENABLED:
+    @router.get("/metrics", include_in_schema=False)
+    async def metrics(authorization: Optional[str] = Header(None)):
+        if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/")
 def read_root():
     return {"Hello": "World"}
+
+
+# === FastAPI App ===
+def create_app() -> FastAPI:
+    """
+    Builds the app. Importing this module stays cheap: the DB engine, bcrypt
+    and JWT libraries, Pillow and storage SDKs are initialized on first use,
+    or in the lifespan when PRELOAD_ON_STARTUP is set.
+    """
+    logging.basicConfig(level=logging.DEBUG if DEBUG else logging.INFO)
+
+    app = FastAPI(
+        title="Link-in-Bio API",
+        version="1.0.0",
+        description="API backend for Link-in-Bio app",
+        lifespan=lifespan,
+    )
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+    app.add_exception_handler(PasswordHasherBusy, password_hasher_busy_handler)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "X-Next-Cursor", "Location"],
+    )
+    app.add_middleware(MaxBodySizeMiddleware, max_bytes=MAX_REQUEST_BODY_BYTES)
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(InstrumentationMiddleware)
+
+    app.include_router(router)
+
+    if STORAGE_BACKEND == "local":
+        os.makedirs(AVATAR_DIR, exist_ok=True)
+        app.mount("/media", MediaFiles(directory=MEDIA_DIR), name="media")
+    return app
+
+
+# uvicorn app.main:app / Vercel; `uvicorn --factory app.main:create_app` also works
+app = create_app()
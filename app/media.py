@@ -0,0 +1,98 @@
+import os
+import re
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from .cache import TTLCache
+from .config import (
+    MEDIA_MAX_AGE, MEDIA_CACHE_TTL, MEDIA_CACHE_MAX_ENTRIES, MEDIA_CACHE_MAX_FILE_BYTES
+)
+from .metrics import registry
+
+# Content-addressed keys (<sha256[:40]>_<size>.<fmt>) plus the older
+# <username>_<uuid>[_<size>].<ext> names: neither is ever rewritten in place
+IMMUTABLE_NAME = re.compile(r"^(?:[0-9a-f]{40}_\d+|.+_[0-9a-f]{32}(?:_\d+)?)\.\w+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+media_cache_requests = registry.counter(
+    "media_cache_requests_total", "Hot media cache lookups", ["result"]
+)
+
+
+def is_immutable(path: str) -> bool:
+    return bool(IMMUTABLE_NAME.match(os.path.basename(path)))
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class MediaFiles(StaticFiles):
+    """
+    StaticFiles for avatars:
+
+    - immutable names get a year-long `immutable` Cache-Control and an ETag
+      derived from the name, so revalidation never depends on mtime;
+    - conditional (If-None-Match / If-Modified-Since) and Range requests are
+      answered by Starlette's FileResponse, which hands the file to the server
+      via `http.response.pathsend` (sendfile) where the server supports it;
+    - small immutable files are kept in an in-process LRU, so hot avatars skip
+      the stat() and read() entirely.
+    """
+
+    def __init__(self, *args, cache_entries: int = MEDIA_CACHE_MAX_ENTRIES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hot = TTLCache(cache_entries, MEDIA_CACHE_TTL) if cache_entries > 0 else None
+
+    async def get_response(self, path: str, scope) -> Response:
+        request_headers = Headers(scope=scope)
+        cacheable = (
+            self.hot is not None
+            and scope["method"] in ("GET", "HEAD")
+            and "range" not in request_headers
+            and is_immutable(path)
+        )
+        if cacheable:
+            entry = self.hot.get(path)
+            media_cache_requests.inc(result="hit" if entry else "miss")
+            if entry is not None:
+                return self.cached_response(entry, request_headers)
+
+        response = await super().get_response(path, scope)
+
+        if (
+            cacheable
+            and isinstance(response, FileResponse)
+            and response.stat_result.st_size <= MEDIA_CACHE_MAX_FILE_BYTES
+        ):
+            body = await run_in_threadpool(read_file, response.path)
+            headers = {
+                name: value for name, value in response.headers.items()
+                if name != "content-length"
+            }
+            self.hot.set(path, (body, headers))
+            return Response(body, headers=headers)
+        return response
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        name = os.path.basename(full_path)
+        if is_immutable(name):
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            response.headers["etag"] = f'"{os.path.splitext(name)[0][-64:]}"'
+        else:
+            response.headers["cache-control"] = f"public, max-age={MEDIA_MAX_AGE}"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def cached_response(self, entry, request_headers: Headers) -> Response:
+        body, headers = entry
+        if self.is_not_modified(Headers(headers), request_headers):
+            return NotModifiedResponse(Headers(headers))
+        return Response(body, headers=headers)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, JSON, DateTime, Date, LargeBinary, Float, Boolean, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -11,9 +11,27 @@ class User(Base):
     hashed_password = Column(String)
     bio = Column(String, default="")
     avatar_url = Column(String, default="")
+    # {"webp": {"64": url, ...}, "avif": {...}} rendered from the uploaded avatar
+    avatar_variants = Column(JSON, nullable=True)
+    # Bumped by every profile/link mutation; drives ETags and cached snapshots
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Embedded in access tokens; bumping it revokes every issued token
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # links = relationship("Link", back_populates="owner")
-    links = relationship("Link", back_populates="owner", lazy="selectin")
+    # Never loaded implicitly: queries opt in with selectinload (see crud.user_query)
+    links = relationship(
+        "Link", back_populates="owner", lazy="raise",
+        order_by="(Link.position, Link.id)"
+    )
+
+    __table_args__ = (
+        # /search: prefix + fuzzy username matching (pg_trgm); SQLite uses FTS5, see app.search
+        Index(
+            "ix_users_username_trgm", "username",
+            postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
 class Link(Base):
     __tablename__ = "links"
@@ -22,5 +40,84 @@ class Link(Base):
     title = Column(String)
     url = Column(String)
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Display order on the profile; ties fall back to id
+    position = Column(Integer, nullable=False, default=0, server_default="0")
+    # Filled in by app.linkcheck: last HTTP status (NULL when unreachable, see
+    # check_error), where redirects ended, favicon and OpenGraph (or <title>) title
+    http_status = Column(Integer, nullable=True)
+    final_url = Column(String, nullable=True)
+    favicon_url = Column(String, nullable=True)
+    og_title = Column(String, nullable=True)
+    check_error = Column(String, nullable=True)
+    # UTC, naive; NULL until the first check (and again after the URL changes)
+    checked_at = Column(DateTime, nullable=True, index=True)
+
+    owner = relationship("User", back_populates="links", lazy="raise")
+
+    __table_args__ = (
+        # Keyset pagination: WHERE user_id = ? AND (position, id) > (?, ?)
+        Index("ix_links_user_id_position_id", "user_id", "position", "id"),
+        # /search: full-text on titles; the expression must match app.search.link_title_vector
+        Index(
+            "ix_links_title_tsv", text("to_tsvector('simple', coalesce(title, ''))"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+class LinkClick(Base):
+    """Hourly click rollup, written in batches by app.clicks."""
+    __tablename__ = "link_clicks"
+
+    link_id = Column(Integer, ForeignKey("links.id", ondelete="CASCADE"), primary_key=True)
+    # Start of the hour (UTC, naive)
+    hour = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
+
+class ProfileViewRollup(Base):
+    """Daily profile views plus a HyperLogLog sketch of unique visitors (app.analytics)."""
+    __tablename__ = "profile_view_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(Integer, nullable=False, default=0, server_default="0")
+    # zlib-compressed HLL registers
+    sketch = Column(LargeBinary, nullable=False)
+
+class RateLimitBucket(Base):
+    """Shared token buckets for app.ratelimit's database storage."""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Unix time of the last check
+    updated = Column(Float, nullable=False, index=True)
+    # Outcome of the last check, read back via RETURNING
+    allowed = Column(Boolean, nullable=False)
+
+class Job(Base):
+    """Durable background work, claimed and run by app.jobs workers."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed; a retry goes back to queued
+    status = Column(String, nullable=False, default="queued", server_default="queued")
+    # Small JSON input; bulky input (an uploaded avatar) is staged on disk and referenced here
+    payload = Column(JSON, nullable=False)
+    result = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False)
+    last_error = Column(String, nullable=True)
+    # Owner allowed to read the status; NULL for system jobs
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    # UTC, naive. Not before run_at (retry backoff); a running job whose
+    # locked_until has passed belongs to a dead worker and is claimed again
+    run_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True, index=True)
 
-    owner = relationship("User", back_populates="links")
+    __table_args__ = (
+        # Claim: WHERE type = ? AND status = ? AND run_at <= ? ORDER BY run_at
+        Index("ix_jobs_type_status_run_at", "type", "status", "run_at"),
+    )
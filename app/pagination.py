@@ -0,0 +1,35 @@
+import base64
+import json
+from typing import Optional, Sequence
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values) -> str:
+    """Opaque, URL-safe token for the sort key of the last row on a page."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, int) for v in values):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def split_page(rows: Sequence, limit: int, key) -> tuple:
+    """Split a `limit + 1` fetch into the page and the cursor of the next one."""
+    page = list(rows[:limit])
+    next_cursor: Optional[str] = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(*key(page[-1]))
+    return page, next_cursor
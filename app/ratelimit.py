@@ -0,0 +1,220 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+
+from .cache import TTLCache
+from .config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_STORAGE, RATE_LIMIT_PUBLIC_STORAGE,
+    RATE_LIMIT_MAX_KEYS, RATE_LIMIT_PUBLIC
+)
+from .crud import take_rate_limit_token, prune_rate_limit_buckets
+from .database import AsyncSessionLocal
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+rate_limit_seconds = registry.histogram(
+    "rate_limit_check_seconds", "Time spent checking a rate limit bucket", ["storage"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total", "Requests rejected with 429", ["scope"]
+)
+rate_limit_errors = registry.counter(
+    "rate_limit_storage_errors_total", "Bucket checks that failed open", ["storage"]
+)
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Rate:
+    """Token bucket: `capacity` requests of burst, refilled at `refill` per second."""
+    capacity: int
+    refill: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        """"10/minute", "5/second", "100/hour" ..."""
+        count, _, period = value.strip().partition("/")
+        seconds = PERIODS[period.strip().rstrip("s")]
+        return cls(int(count), int(count) / seconds)
+
+    @property
+    def full_after(self) -> float:
+        """Seconds for an empty bucket to refill; idle buckets can be forgotten after that."""
+        return self.capacity / self.refill
+
+
+# === Storages (take() must be atomic per key) ===
+class RateLimitStorage:
+    name = "base"
+
+    async def take(self, key: str, rate: Rate, cost: int = 1) -> Tuple[bool, float]:
+        """Consumes `cost` tokens if available; returns (allowed, tokens left)."""
+        raise NotImplementedError
+
+
+class MemoryRateLimitStorage(RateLimitStorage):
+    """Per-process buckets; atomic because take() never awaits."""
+    name = "memory"
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.buckets = TTLCache(max_keys)
+
+    async def take(self, key: str, rate: Rate, cost: int = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key) or (rate.capacity, now)
+        tokens = min(rate.capacity, tokens + (now - updated) * rate.refill)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.buckets.set(key, (tokens, now), ttl=rate.full_after)
+        return allowed, tokens
+
+
+class DatabaseRateLimitStorage(RateLimitStorage):
+    """
+    Buckets in the rate_limit_buckets table, shared by every worker/instance.
+    Each check is a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so
+    concurrent requests serialize on the row instead of racing.
+    """
+    name = "database"
+    PRUNE_EVERY = 1000
+
+    def __init__(self, prune_after: float = 86400):
+        self.prune_after = prune_after
+        self.calls = 0
+
+    async def take(self, key: str, rate: Rate, cost: int = 1) -> Tuple[bool, float]:
+        now = time.time()
+        self.calls += 1
+        async with AsyncSessionLocal() as db:
+            allowed, tokens = await take_rate_limit_token(db, key, rate.capacity, rate.refill, cost, now)
+            if self.calls % self.PRUNE_EVERY == 0:
+                await prune_rate_limit_buckets(db, now - self.prune_after)
+        return allowed, tokens
+
+
+class RedisRateLimitStorage(RateLimitStorage):
+    """Any Redis-protocol server (Redis, Valkey, KeyDB, ...); needs the `redis` package."""
+    name = "redis"
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local refill = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError(
+                f"RATE_LIMIT_STORAGE={url} needs the redis package: pip install redis"
+            ) from None
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, rate: Rate, cost: int = 1) -> Tuple[bool, float]:
+        allowed, tokens = await self.script(
+            keys=[f"ratelimit:{key}"], args=[rate.capacity, rate.refill, cost, time.time()]
+        )
+        return bool(allowed), float(tokens)
+
+
+def storage_from_url(url: str) -> RateLimitStorage:
+    if url == "memory":
+        return MemoryRateLimitStorage()
+    if url == "database":
+        return DatabaseRateLimitStorage()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRateLimitStorage(url)
+    raise ValueError(f"Unknown rate limit storage: {url}")
+
+
+# === Limiter ===
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimiter:
+    """
+    Checks one bucket per identity ("ip:1.2.3.4", "user:alice") under a scope.
+    Scopes can be routed to their own storage, e.g. cheap per-worker buckets
+    for public reads and shared ones for login. Storage failures fail open.
+    """
+
+    def __init__(self, storage: RateLimitStorage, scope_storages: Optional[Dict[str, RateLimitStorage]] = None,
+                 enabled: bool = True):
+        self.storage = storage
+        self.scope_storages = scope_storages or {}
+        self.enabled = enabled
+
+    async def hit(self, scope: str, rate: Rate, *identities: str, cost: int = 1) -> None:
+        """
+        Charges `cost` tokens per identity; 429 when a bucket cannot pay.
+        cost=0 only checks: it refuses once a bucket is empty, charging nothing.
+        """
+        if not self.enabled:
+            return
+        storage = self.scope_storages.get(scope, self.storage)
+        for identity in identities:
+            started = time.perf_counter()
+            try:
+                allowed, tokens = await storage.take(f"{scope}:{identity}", rate, cost)
+            except Exception as e:
+                rate_limit_errors.inc(storage=storage.name)
+                logger.warning(f"Rate limit storage error ({storage.name}): {e}")
+                continue
+            finally:
+                rate_limit_seconds.observe(time.perf_counter() - started, storage=storage.name)
+            if not allowed or (cost == 0 and tokens < 1):
+                rate_limit_rejections.inc(scope=scope)
+                raise RateLimitExceeded(retry_after=(1 - tokens) / rate.refill)
+
+    def limit_by_ip(self, scope: str, rate: Rate):
+        """FastAPI dependency that limits a route per client IP."""
+        async def dependency(request: Request):
+            await self.hit(scope, rate, f"ip:{client_ip(request)}")
+        return dependency
+
+
+def retry_after_header(exc: RateLimitExceeded) -> str:
+    return str(max(1, math.ceil(exc.retry_after)))
+
+
+_default_storage = storage_from_url(RATE_LIMIT_STORAGE)
+limiter = RateLimiter(
+    _default_storage,
+    scope_storages={
+        "public": _default_storage if RATE_LIMIT_PUBLIC_STORAGE == RATE_LIMIT_STORAGE
+        else storage_from_url(RATE_LIMIT_PUBLIC_STORAGE),
+    },
+    enabled=RATE_LIMIT_ENABLED,
+)
+public_rate_limit = limiter.limit_by_ip("public", Rate.parse(RATE_LIMIT_PUBLIC))
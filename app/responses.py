@@ -0,0 +1,185 @@
+import gzip
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from .cache import TTLCache, encoded_etag
+from .config import (
+    COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_CACHE_MAX_ENTRIES
+)
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# === JSON encoding ===
+@lru_cache(maxsize=None)
+def adapter_for(type_) -> TypeAdapter:
+    return TypeAdapter(type_)
+
+
+def json_bytes(type_, value: Any) -> bytes:
+    """
+    Validates ORM objects / dicts against `type_` and serializes straight to
+    JSON bytes in pydantic-core, skipping jsonable_encoder and json.dumps.
+    """
+    adapter = adapter_for(type_)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def model_response(type_, value: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    return Response(
+        content=json_bytes(type_, value), status_code=status_code,
+        media_type="application/json", headers=headers
+    )
+
+
+# === Compression ===
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    return accepted
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def add_vary(headers: list, vary: Optional[bytes]) -> None:
+    """Appends Accept-Encoding to the Vary header (list of raw header pairs)."""
+    if vary is None:
+        headers.append((b"vary", b"Accept-Encoding"))
+    elif b"accept-encoding" not in vary.lower() and vary != b"*":
+        headers.append((b"vary", vary + b", Accept-Encoding"))
+    else:
+        headers.append((b"vary", vary))
+
+
+class CompressionMiddleware:
+    """
+    Compresses single-message responses (JSON, text) above `minimum_size` with
+    brotli when available and accepted, gzip otherwise. Streaming and file
+    responses pass through untouched. Every compressible response varies on
+    Accept-Encoding, compressed or not, and a compressed one gets its own
+    strong ETag ("<etag>-gz"). Responses carrying an ETag (public profile
+    snapshots) have their compressed bodies cached by path + ETag.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 cache_entries: int = COMPRESSION_CACHE_MAX_ENTRIES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = TTLCache(cache_entries) if cache_entries > 0 else None
+
+    def choose_encoding(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accepted = accepted_encodings(value.decode("latin-1"))
+                if brotli is not None and "br" in accepted:
+                    return "br"
+                if "gzip" in accepted:
+                    return "gzip"
+        return None
+
+    @staticmethod
+    def held_etag(scope, etag: bytes, encoding: str) -> bytes:
+        """
+        The ETag a 304 should carry: the compressed variant's if that is what
+        the client revalidated (If-None-Match), the plain one otherwise.
+        """
+        variant = encoded_etag(etag.decode("latin-1"), encoding).encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == b"if-none-match" and variant in (tag.strip().removeprefix(b"W/") for tag in value.split(b",")):
+                return variant
+        return etag
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = self.choose_encoding(scope)
+
+        start = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend from FileResponse
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            body = message.get("body", b"")
+            headers = dict(start["headers"])
+            etag = headers.get(b"etag")
+            if start["status"] == 304 and etag and encoding:
+                passthrough = True
+                raw_headers = [(name, value) for name, value in start["headers"] if name != b"etag"]
+                raw_headers.append((b"etag", self.held_etag(scope, etag, encoding)))
+                await send({**start, "headers": raw_headers})
+                return await send(message)
+
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or b"content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            raw_headers = [
+                (name, value) for name, value in start["headers"]
+                if name not in (b"content-length", b"vary", b"etag")
+            ]
+            add_vary(raw_headers, headers.get(b"vary"))
+            if encoding is None or len(body) < self.minimum_size:
+                if etag:
+                    raw_headers.append((b"etag", etag))
+                raw_headers.append((b"content-length", str(len(body)).encode()))
+                await send({**start, "headers": raw_headers})
+                return await send(message)
+
+            key = (scope["path"], etag, encoding) if etag and self.cache is not None else None
+            compressed = self.cache.get(key) if key else None
+            if compressed is None:
+                compressed = compress(body, encoding)
+                if key:
+                    self.cache.set(key, compressed)
+
+            if etag:
+                # Different bytes, different strong validator
+                raw_headers.append((b"etag", encoded_etag(etag.decode("latin-1"), encoding).encode("latin-1")))
+            raw_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start, "headers": raw_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
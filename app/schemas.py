@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, ConfigDict, validator
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, ConfigDict, validator, computed_field
+from datetime import date, datetime
+from typing import Dict, List, Optional
 import re
 
 # 🔐 Auth Models
@@ -44,37 +45,132 @@ class Token(BaseModel):
 class LinkCreate(BaseModel):
     title: str
     url: str
+    position: Optional[int] = None
 
 class LinkUpdate(BaseModel):
     title: Optional[str] = None
     url: Optional[str] = None
+    position: Optional[int] = None
+
+class LinkBatchUpdate(LinkUpdate):
+    id: int
 
 class LinkOut(BaseModel):
     id: int
     title: str
     url: str
+    position: int = 0
+    # From the last health check (null until the link has been checked)
+    http_status: Optional[int] = None
+    final_url: Optional[str] = None
+    favicon_url: Optional[str] = None
+    og_title: Optional[str] = None
+    check_error: Optional[str] = None
+    checked_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class HourlyClicks(BaseModel):
+    hour: datetime
+    count: int
+
+class LinkClicks(BaseModel):
+    link_id: int
+    total: int
+    hourly: List[HourlyClicks]
+
+# 📈 Analytics Models
+
+class DailyViews(BaseModel):
+    day: date
+    views: int
+    unique_visitors: int
+
+class ProfileStats(BaseModel):
+    views: int
+    # Approximate (HyperLogLog), de-duplicated across the whole range
+    unique_visitors: int
+    daily: List[DailyViews]
+
+# 🔎 Search Models
+class UserSearchHit(BaseModel):
+    username: str
+    bio: Optional[str] = ""
+    avatar_url: Optional[str] = ""
+
+    model_config = ConfigDict(from_attributes=True)
+
+class LinkSearchHit(BaseModel):
+    id: int
+    title: str
+    url: str
+    username: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+class SearchResults(BaseModel):
+    # Only the list matching the requested type is filled
+    users: List[UserSearchHit] = []
+    links: List[LinkSearchHit] = []
+
+# ⚙️ Job Models
+class JobOut(BaseModel):
+    id: int
+    type: str
+    # queued, running, succeeded or failed
+    status: str
+    attempts: int
+    max_attempts: int
+    last_error: Optional[str] = None
+    result: Optional[dict] = None
+    # Next attempt (queued jobs)
+    run_at: datetime
+    created_at: datetime
+    finished_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 # 👤 User Models
 
+AvatarVariants = Dict[str, Dict[str, str]]
+
+def build_srcsets(variants: Optional[AvatarVariants]) -> Dict[str, str]:
+    """{"webp": "url 64w, url 128w, ..."} for <picture>/<img srcset>."""
+    return {
+        fmt: ", ".join(f"{url} {size}w" for size, url in sorted(urls.items(), key=lambda item: int(item[0])))
+        for fmt, urls in (variants or {}).items()
+    }
+
 class UserOut(BaseModel):
     username: str
     email: EmailStr
     bio: Optional[str] = ""
     avatar_url: Optional[str] = ""
+    avatar_variants: Optional[AvatarVariants] = None
     links: List[LinkOut] = []
 
+    @computed_field
+    @property
+    def avatar_srcset(self) -> Dict[str, str]:
+        return build_srcsets(self.avatar_variants)
+
     model_config = ConfigDict(from_attributes=True)
 
 class UserUpdate(BaseModel):
     bio: Optional[str] = ""
     avatar_url: Optional[str] = ""
+    avatar_variants: Optional[AvatarVariants] = None
 
 class ProfileOut(BaseModel):
     username: str
     bio: Optional[str] = ""
     avatar_url: Optional[str] = ""
+    avatar_variants: Optional[AvatarVariants] = None
     links: List[LinkOut] = []
 
+    @computed_field
+    @property
+    def avatar_srcset(self) -> Dict[str, str]:
+        return build_srcsets(self.avatar_variants)
+
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,194 @@
+import re
+from typing import List, Optional, Sequence
+
+from sqlalchemy import Integer, and_, case, cast, column, func, literal, literal_column, or_, select, table, true, union_all
+from sqlalchemy.sql import Select
+
+from . import models
+from .config import SEARCH_MAX_CANDIDATES, SEARCH_MAX_TERMS
+
+# Relevance is scaled to an integer so (score, id) works as a keyset cursor
+SCORE_SCALE = 1_000_000
+EXACT_BOOST = 3 * SCORE_SCALE
+PREFIX_BOOST = 2 * SCORE_SCALE
+
+WORD = re.compile(r"[^\W_]+")
+
+
+def search_terms(query: str) -> List[str]:
+    return [word.lower() for word in WORD.findall(query)][:SEARCH_MAX_TERMS]
+
+
+def like_prefix(value: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", value) + "%"
+
+
+# === Postgres: pg_trgm on usernames, tsvector on link titles ===
+# Both indexes come from migration 6b1d3f8a2c57 (and models' ddl_if indexes)
+TEXT_CONFIG = literal_column("'simple'")
+
+
+def link_title_vector():
+    # Must stay identical to ix_links_title_tsv or the index is not used
+    return func.to_tsvector(TEXT_CONFIG, func.coalesce(models.Link.title, literal_column("''")))
+
+
+class PostgresSearch:
+    def user_candidates(self, query: str) -> Select:
+        username = models.User.username
+        return (
+            select(models.User.id, func.similarity(username, query).label("relevance"))
+            .where(or_(username.ilike(like_prefix(query), escape="\\"), username.op("%")(query)))
+            .limit(SEARCH_MAX_CANDIDATES)
+        )
+
+    def link_candidates(self, terms: Sequence[str]) -> Select:
+        # Every term must match; the last may be a prefix (search as you type)
+        tsquery = func.to_tsquery(TEXT_CONFIG, " & ".join([*terms[:-1], f"{terms[-1]}:*"]))
+        vector = link_title_vector()
+        return (
+            select(models.Link.id, func.ts_rank(vector, tsquery).label("relevance"))
+            .where(vector.op("@@")(tsquery))
+            .limit(SEARCH_MAX_CANDIDATES)
+        )
+
+
+# === SQLite (debug): FTS5 tables kept in sync by triggers ===
+def fts_triggers(table_name: str, column_name: str, fts: str) -> dict:
+    insert = f"INSERT INTO {fts}(rowid, {column_name}) VALUES (new.id, new.{column_name});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {column_name}) VALUES ('delete', old.id, old.{column_name});"
+    return {
+        f"{fts}_ai": f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table_name} BEGIN {insert} END",
+        f"{fts}_ad": f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table_name} BEGIN {delete} END",
+        f"{fts}_au": f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column_name} ON {table_name} "
+                     f"BEGIN {delete} {insert} END",
+    }
+
+
+SQLITE_FTS_DDL = {
+    "users_fts": "CREATE VIRTUAL TABLE users_fts USING fts5("
+                 "username, content='users', content_rowid='id', tokenize='trigram')",
+    # Without a prefix index of the right length, FTS5 materialises the merged
+    # doclist of every matching term before intersecting ("ga*" on 1M titles);
+    # 2-6 chars covers search-as-you-type for roughly twice the index size
+    "links_fts": "CREATE VIRTUAL TABLE links_fts USING fts5("
+                 "title, content='links', content_rowid='id', prefix='2 3 4 5 6')",
+    **fts_triggers("users", "username", "users_fts"),
+    **fts_triggers("links", "title", "links_fts"),
+}
+
+
+def create_sqlite_index(connection) -> bool:
+    """
+    Creates whatever FTS5 tables/triggers are missing (sync connection) and
+    rebuilds the index from the base tables if anything was. Returns True
+    when it had work to do; False as well before the base tables exist.
+    """
+    names = ", ".join(f"'{name}'" for name in ["users", "links", *SQLITE_FTS_DDL])
+    existing = {row[0] for row in connection.exec_driver_sql(f"SELECT name FROM sqlite_master WHERE name IN ({names})")}
+    if not {"users", "links"} <= existing:
+        return False
+    missing = [name for name in SQLITE_FTS_DDL if name not in existing]
+    for name in missing:
+        connection.exec_driver_sql(SQLITE_FTS_DDL[name])
+    if missing:
+        connection.exec_driver_sql("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+        connection.exec_driver_sql("INSERT INTO links_fts(links_fts) VALUES ('rebuild')")
+    return bool(missing)
+
+
+def fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+users_fts = table("users_fts", column("rowid"))
+links_fts = table("links_fts", column("rowid"))
+
+
+class SqliteSearch:
+    def user_candidates(self, query: str) -> Select:
+        prefix = (
+            select(models.User.id, literal(0.0).label("relevance"))
+            .where(models.User.username.like(like_prefix(query), escape="\\"))
+            .limit(SEARCH_MAX_CANDIDATES)
+            .subquery()
+        )
+        grams = sorted({query.lower()[i:i + 3] for i in range(len(query) - 2)})
+        if not grams:
+            return select(prefix.c.id, prefix.c.relevance)
+
+        # Typos still share most trigrams with the username; bm25 over the
+        # OR of them ranks by overlap, squashed into 0..1 like similarity()
+        bm25 = func.bm25(literal_column("users_fts"))
+        fuzzy = (
+            select(users_fts.c.rowid.label("id"), (-bm25 / (1 - bm25)).label("relevance"))
+            .where(literal_column("users_fts").op("MATCH")(" OR ".join(fts_phrase(gram) for gram in grams)))
+            .limit(SEARCH_MAX_CANDIDATES)
+            .subquery()
+        )
+        both = union_all(
+            select(prefix.c.id, prefix.c.relevance), select(fuzzy.c.id, fuzzy.c.relevance)
+        ).subquery()
+        return select(both.c.id, func.max(both.c.relevance).label("relevance")).group_by(both.c.id)
+
+    def link_candidates(self, terms: Sequence[str]) -> Select:
+        match = " ".join([*(fts_phrase(term) for term in terms[:-1]), fts_phrase(terms[-1]) + "*"])
+        matched = (
+            select(links_fts.c.rowid.label("id"))
+            .where(literal_column("links_fts").op("MATCH")(match))
+            .limit(SEARCH_MAX_CANDIDATES)
+            .subquery()
+        )
+        # Every candidate contains every term, so on one short column bm25
+        # mostly ranks by title length; counting words directly is ~4x
+        # cheaper than bm25's per-row doclist/docsize reads
+        title = models.Link.title
+        words = func.length(title) - func.length(func.replace(title, " ", "")) + 1
+        return (
+            select(matched.c.id, (literal(1.0) / words).label("relevance"))
+            .join(models.Link, models.Link.id == matched.c.id)
+        )
+
+
+BACKENDS = {"postgresql": PostgresSearch(), "sqlite": SqliteSearch()}
+
+
+# === Shared ranking + keyset pagination ===
+def keyset(score, id_column, after: Optional[Sequence[int]]):
+    if after is None:
+        return true()
+    last_score, last_id = after
+    return or_(score < last_score, and_(score == last_score, id_column > last_id))
+
+
+def user_search(dialect: str, query: str, limit: int, after: Optional[Sequence[int]] = None) -> Select:
+    """Exact username first, then prefix matches, then near misses by similarity."""
+    candidates = BACKENDS[dialect].user_candidates(query).subquery()
+    username = models.User.username
+    score = case(
+        (func.lower(username) == query.lower(), EXACT_BOOST),
+        (username.ilike(like_prefix(query), escape="\\"), PREFIX_BOOST),
+        else_=0,
+    ) + cast(candidates.c.relevance * SCORE_SCALE, Integer)
+    return (
+        select(models.User.id, username, models.User.bio, models.User.avatar_url, score.label("score"))
+        .join(candidates, candidates.c.id == models.User.id)
+        .where(keyset(score, models.User.id, after))
+        .order_by(score.desc(), models.User.id)
+        .limit(limit)
+    )
+
+
+def link_search(dialect: str, terms: Sequence[str], limit: int, after: Optional[Sequence[int]] = None) -> Select:
+    candidates = BACKENDS[dialect].link_candidates(terms).subquery()
+    score = cast(candidates.c.relevance * SCORE_SCALE, Integer)
+    return (
+        select(
+            models.Link.id, models.Link.title, models.Link.url, models.User.username, score.label("score")
+        )
+        .join(candidates, candidates.c.id == models.Link.id)
+        .join(models.User, models.User.id == models.Link.user_id)
+        .where(keyset(score, models.Link.id, after))
+        .order_by(score.desc(), models.Link.id)
+        .limit(limit)
+    )
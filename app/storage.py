@@ -0,0 +1,221 @@
+import asyncio
+import os
+import posixpath
+import re
+from typing import Dict, Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import MEDIA_DIR, STORAGE_BACKEND
+
+
+def content_key(digest: str, suffix: str, prefix: str = "avatars") -> str:
+    """Content-addressed object key, e.g. avatars/3f2a..._256.webp"""
+    return f"{prefix}/{short_digest(digest)}{suffix}"
+
+
+def short_digest(digest: str) -> str:
+    return digest[:40]
+
+
+def key_digest(key: str) -> str:
+    """The short digest a content_key() starts with."""
+    return posixpath.basename(key).split("_", 1)[0]
+
+
+class StorageBackend:
+    """Async object store for media addressed by key ("avatars/<hash>_<size>.<fmt>")."""
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def save(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        """Maps a public URL issued by this backend back to its key (None if foreign)."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def save_missing(self, objects: Dict[str, bytes]) -> int:
+        """Stores only the keys that are not there yet; returns how many were written."""
+        keys = list(objects)
+        present = await asyncio.gather(*(self.exists(key) for key in keys))
+        missing = [key for key, found in zip(keys, present) if not found]
+        await asyncio.gather(*(self.save(key, objects[key]) for key in missing))
+        return len(missing)
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        await asyncio.gather(*(self.delete(key) for key in set(keys)))
+
+
+class LocalStorageBackend(StorageBackend):
+    """Files under MEDIA_DIR, served by the /media mount."""
+
+    def __init__(self, root: str = MEDIA_DIR, base_url: str = "/media"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool(os.path.exists, self.path(key))
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.part"
+        with open(partial, "wb") as buffer:
+            buffer.write(data)
+        os.replace(partial, path)
+
+    async def save(self, key: str, data: bytes) -> None:
+        await run_in_threadpool(self._write, key, data)
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self._remove, key)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        if not url or not url.startswith(self.base_url + "/"):
+            return None
+        key = posixpath.normpath(url[len(self.base_url) + 1:])
+        return None if key.startswith("..") else key
+
+
+class CloudinaryStorageBackend(StorageBackend):
+    """
+    Cloudinary uploads run in the threadpool (the SDK is blocking but keeps a
+    urllib3 pool); existence checks are HEAD requests on the CDN through one
+    shared httpx client.
+    """
+
+    URL_PATTERN = re.compile(r"/image/upload/(?:v\d+/)?(?P<key>[^?#]+)$")
+
+    def __init__(self):
+        import cloudinary
+        import httpx
+
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            secure=True
+        )
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(5.0),
+            limits=httpx.Limits(max_keepalive_connections=10),
+        )
+
+    @staticmethod
+    def public_id(key: str) -> str:
+        return posixpath.splitext(key)[0]
+
+    async def exists(self, key: str) -> bool:
+        response = await self.client.head(self.url(key))
+        return response.status_code == 200
+
+    def _upload(self, key: str, data: bytes) -> None:
+        import cloudinary.uploader
+
+        cloudinary.uploader.upload(
+            data,
+            public_id=self.public_id(key),
+            format=posixpath.splitext(key)[1].lstrip("."),
+            resource_type="image",
+            overwrite=False,
+        )
+
+    async def save(self, key: str, data: bytes) -> None:
+        await run_in_threadpool(self._upload, key, data)
+
+    def _destroy(self, key: str) -> None:
+        import cloudinary.uploader
+
+        cloudinary.uploader.destroy(self.public_id(key), resource_type="image", invalidate=True)
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self._destroy, key)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    def url(self, key: str) -> str:
+        import cloudinary.utils
+
+        public_id, ext = posixpath.splitext(key)
+        return cloudinary.utils.cloudinary_url(public_id, format=ext.lstrip("."), secure=True)[0]
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        match = self.URL_PATTERN.search(url or "")
+        return match.group("key") if match else None
+
+
+class MemoryStorageBackend(StorageBackend):
+    """In-process stand-in for tests and benchmarks."""
+
+    def __init__(self, base_url: str = "/media"):
+        self.base_url = base_url.rstrip("/")
+        self.objects: Dict[str, bytes] = {}
+
+    async def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    async def save(self, key: str, data: bytes) -> None:
+        self.objects[key] = data
+
+    async def delete(self, key: str) -> None:
+        self.objects.pop(key, None)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        if not url or not url.startswith(self.base_url + "/"):
+            return None
+        return url[len(self.base_url) + 1:]
+
+
+BACKENDS = {
+    "local": LocalStorageBackend,
+    "cloudinary": CloudinaryStorageBackend,
+    "memory": MemoryStorageBackend,
+}
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = BACKENDS[STORAGE_BACKEND]()
+    return _storage
+
+
+def set_storage(backend: StorageBackend) -> None:
+    global _storage
+    _storage = backend
+
+
+async def close_storage() -> None:
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
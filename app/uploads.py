@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+from .config import AVATAR_MAX_BYTES, AVATAR_STAGING_DIR, UPLOAD_CHUNK_SIZE, IMAGE_WORKERS
+from .crud import avatar_in_use, get_user_by_id, job_pending, newer_job_succeeded, update_user_profile
+from .database import AsyncSessionLocal
+from .images import InvalidImage, plan_variants, render_avatar_variants, supported_formats
+from .instrumentation import record_upload
+from .jobs import JobFailed, enqueue, job_handler
+from .metrics import registry
+from .storage import content_key, get_storage, key_digest, short_digest
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_AVATAR_TYPES = {"image/png", "image/jpeg"}
+
+avatar_upload_seconds = registry.histogram(
+    "avatar_upload_seconds", "Avatar pipeline time by stage (stage = spool to disk)", ["stage"]
+)
+
+def too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Avatar too large. Maximum size is {AVATAR_MAX_BYTES // (1024 * 1024)} MB."
+    )
+
+
+# === Request body cap (rejects oversized uploads before they are spooled) ===
+class MaxBodySizeMiddleware:
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await send({
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Request body too large"}'})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# === Avatar upload pipeline ===
+async def sniff_avatar(avatar: UploadFile) -> tuple:
+    """Reads the first chunk only and validates it by magic bytes."""
+    if avatar.size is not None and avatar.size > AVATAR_MAX_BYTES:
+        raise too_large()
+
+    import filetype
+
+    head = await avatar.read(UPLOAD_CHUNK_SIZE)
+    kind = filetype.guess(head)
+    if not kind or kind.mime not in ALLOWED_AVATAR_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid image format. Only PNG and JPEG allowed."
+        )
+    return head, kind
+
+
+async def stage_avatar(avatar: UploadFile, head: bytes) -> Tuple[str, str]:
+    """
+    Streams the upload to AVATAR_STAGING_DIR chunk by chunk, off the event
+    loop. Returns the staged path and the sha256 of the upload.
+    """
+    await run_in_threadpool(os.makedirs, AVATAR_STAGING_DIR, exist_ok=True)
+    fd, path = await run_in_threadpool(tempfile.mkstemp, suffix=".upload", dir=AVATAR_STAGING_DIR)
+    buffer = await run_in_threadpool(os.fdopen, fd, "wb")
+    digest = hashlib.sha256()
+
+    def write(chunk: bytes):
+        buffer.write(chunk)
+        digest.update(chunk)
+
+    try:
+        size = len(head)
+        chunk = head
+        while chunk:
+            await run_in_threadpool(write, chunk)
+            chunk = await avatar.read(UPLOAD_CHUNK_SIZE)
+            size += len(chunk)
+            if size > AVATAR_MAX_BYTES:
+                raise too_large()
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(os.remove, path)
+        raise
+    await run_in_threadpool(buffer.close)
+    return path, digest.hexdigest()
+
+
+async def remove_staged(path: str) -> None:
+    try:
+        await run_in_threadpool(os.remove, path)
+    except FileNotFoundError:
+        pass
+
+
+def variant_key(digest: str, fmt: str, size: int) -> str:
+    return content_key(digest, f"_{size}.{fmt}")
+
+
+async def store_avatar(staged: str, digest: str) -> Tuple[str, dict]:
+    """
+    Resizes a staged avatar and stores every variant. Variants are keyed by
+    the hash of the upload, so re-uploading an image that is already stored
+    skips both the resize and the upload. Returns the default avatar URL and
+    {format: {size: url}}; raises InvalidImage if Pillow can't decode it.
+    """
+    storage = get_storage()
+    started = time.perf_counter()
+    try:
+        sizes = await run_in_threadpool(plan_variants, staged)
+        keys = {
+            (fmt, size): variant_key(digest, fmt, size)
+            for size in sizes for fmt in supported_formats()
+        }
+        present = await asyncio.gather(*(storage.exists(key) for key in keys.values()))
+        if not all(present):
+            rendered = await render_avatar_variants(staged)
+            rendered_at = time.perf_counter()
+            avatar_upload_seconds.observe(rendered_at - started, stage="resize")
+            written = await storage.save_missing(
+                {keys[variant]: data for variant, data in rendered.items()}
+            )
+            avatar_upload_seconds.observe(time.perf_counter() - rendered_at, stage="store")
+            logger.info(f"Stored {written} avatar variant(s) for {digest[:12]}")
+    finally:
+        record_upload(time.perf_counter() - started)
+
+    variants = {}
+    for (fmt, size), key in keys.items():
+        variants.setdefault(fmt, {})[str(size)] = storage.url(key)
+    default_format = "webp" if "webp" in variants else next(iter(variants))
+    largest = max(variants[default_format], key=int)
+    return variants[default_format][largest], variants
+
+
+# === Avatar job: resize + store off the request, then swap the profile over ===
+AVATAR_JOB = "avatar"
+# Replaced avatars are collected by a later job (see discard_avatar)
+AVATAR_GC_JOB = "avatar-gc"
+AVATAR_GC_DELAY_SECONDS = 600
+
+
+async def queue_avatar(db: AsyncSession, user_id: int, avatar: UploadFile) -> int:
+    """Validates and stages the upload in the request and hands the rest to a job; returns its id."""
+    started = time.perf_counter()
+    head, _ = await sniff_avatar(avatar)
+    staged, digest = await stage_avatar(avatar, head)
+    avatar_upload_seconds.observe(time.perf_counter() - started, stage="stage")
+    record_upload(time.perf_counter() - started)
+    try:
+        return await enqueue(db, AVATAR_JOB, {"staged": staged, "digest": digest}, user_id=user_id)
+    except Exception:
+        # The job was never stored, so nothing else will remove the file
+        await remove_staged(staged)
+        raise
+
+
+@job_handler(AVATAR_JOB, concurrency=max(IMAGE_WORKERS, 1), timeout=120)
+async def process_avatar(job) -> dict:
+    staged = job.payload["staged"]
+    if not await run_in_threadpool(os.path.exists, staged):
+        raise JobFailed("The staged upload is gone (is AVATAR_STAGING_DIR shared with the worker?)")
+    # 🔒 store_avatar trusts files that already exist: never while they are being collected
+    while await collection_running(job.payload["digest"]):
+        await asyncio.sleep(1)
+    try:
+        avatar_url, variants = await store_avatar(staged, job.payload["digest"])
+    except InvalidImage:
+        await remove_staged(staged)
+        raise JobFailed("Invalid or unreadable image.")
+    except Exception:
+        # Retries need the file; the last attempt cleans up
+        if job.attempts >= job.max_attempts:
+            await remove_staged(staged)
+        raise
+    await remove_staged(staged)
+
+    async with AsyncSessionLocal() as db:
+        user = await get_user_by_id(db, job.user_id, models.User.avatar_url, models.User.avatar_variants)
+        # Uploads can finish out of order: never replace a later one
+        if user is None or await newer_job_succeeded(db, AVATAR_JOB, job.user_id, job.id):
+            if user is None or user.avatar_url != avatar_url:
+                await discard_avatar(db, job.user_id, avatar_url, variants)
+            return {"applied": False}
+
+        previous = (user.avatar_url, user.avatar_variants)
+        await update_user_profile(
+            db, job.user_id, schemas.UserUpdate(bio=None, avatar_url=avatar_url, avatar_variants=variants)
+        )
+        # 🧹 The replaced avatar goes once the new one is committed
+        if previous[0] != avatar_url:
+            await discard_avatar(db, job.user_id, *previous)
+    return {"applied": True, "avatar_url": avatar_url, "avatar_variants": variants}
+
+
+# 🧹 Uploads whose job timed out on its last attempt or died with its worker
+STAGED_MAX_AGE_SECONDS = 24 * 3600
+
+
+def sweep_staging_dir(max_age: float) -> int:
+    removed = 0
+    cutoff = time.time() - max_age
+    for entry in os.scandir(AVATAR_STAGING_DIR):
+        if entry.name.endswith(".upload") and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+@job_handler("avatar-staging-sweep", concurrency=1, max_attempts=1, every=3600)
+async def sweep_staged_avatars(job) -> dict:
+    if not await run_in_threadpool(os.path.isdir, AVATAR_STAGING_DIR):
+        return {"removed": 0}
+    return {"removed": await run_in_threadpool(sweep_staging_dir, STAGED_MAX_AGE_SECONDS)}
+
+
+async def discard_avatar(
+    db: AsyncSession, user_id: int, avatar_url: Optional[str], variants: Optional[dict]
+) -> None:
+    """
+    Schedules garbage collection of a replaced avatar once no other profile
+    points at it (content addressing lets users share the same files). Best
+    effort: failures are logged, never raised.
+    """
+    if not avatar_url:
+        return
+    storage = get_storage()
+    urls = {avatar_url}
+    for by_size in (variants or {}).values():
+        urls.update(by_size.values())
+    keys = sorted(key for key in map(storage.key_for_url, urls) if key)
+    if not keys:
+        return
+    try:
+        if await avatar_in_use(db, avatar_url, exclude_user_id=user_id):
+            return
+        payload = {"avatar_url": avatar_url, "digest": key_digest(keys[0]), "keys": keys}
+        await enqueue(db, AVATAR_GC_JOB, payload, delay=AVATAR_GC_DELAY_SECONDS)
+    except Exception as e:
+        logger.warning(f"Avatar cleanup failed for user {user_id}: {e}")
+
+
+async def collection_running(digest: str) -> bool:
+    async with AsyncSessionLocal() as db:
+        return await job_pending(db, AVATAR_GC_JOB, ("running",), digest=short_digest(digest))
+
+
+@job_handler(AVATAR_GC_JOB, concurrency=1, timeout=60)
+async def collect_avatar(job) -> dict:
+    """
+    Deletes a discarded avatar's files unless a profile points at them again
+    or an avatar job for the same image is pending: that job may already have
+    found the files and skipped storing them. Avatar jobs in turn wait while a
+    collection of their image runs, so one of the two always sees the other.
+    """
+    async with AsyncSessionLocal() as db:
+        if await avatar_in_use(db, job.payload["avatar_url"]) or await job_pending(
+            db, AVATAR_JOB, ("queued", "running"), digest=job.payload["digest"]
+        ):
+            return {"removed": 0}
+    await get_storage().delete_many(job.payload["keys"])
+    return {"removed": len(job.payload["keys"])}
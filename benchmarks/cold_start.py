@@ -0,0 +1,142 @@
+"""
+Serverless cold start: import + first request in a fresh interpreter.
+
+Seeds a SQLite database once, then for each scenario starts `--runs` fresh
+processes that import app.main and serve a single request in-process (no
+lifespan, like a cold Vercel function). Reports medians and exits non-zero
+when a budget is exceeded or a deferred dependency is imported eagerly:
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --runs 7 --import-budget 800 --request-budget 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "Passw0rd!"
+
+# Must not be imported by `import app.main`; each is paid on first use instead
+DEFERRED_MODULES = ("jose", "passlib", "filetype", "PIL", "httpx", "cloudinary", "asyncpg", "aiosqlite")
+
+# name -> (method, path, sends a bearer token)
+SCENARIOS = {
+    "root": ("GET", "/", False),
+    "profile": ("GET", "/users/bench", False),
+    "redirect": ("GET", "/r/1", False),
+    "login": ("POST", "/login", False),
+    "me": ("GET", "/me", True),
+}
+
+
+def child(scenario: str, token: str):
+    """Runs in the fresh interpreter; prints one JSON line."""
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    started = time.perf_counter()
+    import app.main
+    imported = time.perf_counter()
+    eager = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+    import httpx
+
+    method, path, auth = SCENARIOS[scenario]
+
+    async def request():
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold") as client:
+            kwargs = {"headers": {"Authorization": f"Bearer {token}"}} if auth else {}
+            if scenario == "login":
+                kwargs["json"] = {"username": "bench", "password": PASSWORD}
+            return await client.request(method, path, **kwargs)
+
+    before = time.perf_counter()
+    response = asyncio.run(request())
+    done = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "request_ms": (done - before) * 1000,
+        "status": response.status_code,
+        "eager": eager,
+    }))
+
+
+async def seed():
+    import logging
+
+    logging.disable(logging.WARNING)
+    from app.auth import create_access_token, hash_password
+    from app.database import async_engine, Base
+    from app import models
+    from sqlalchemy import insert
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(models.User).values(
+            id=1, username="bench", email="bench@example.com", hashed_password=hash_password(PASSWORD)
+        ))
+        await conn.execute(insert(models.Link).values(id=1, title="a", url="https://example.com", user_id=1))
+    await async_engine.dispose()
+    return create_access_token({"sub": "bench", "uid": 1, "tv": 0})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--import-budget", type=float, default=1500, help="median ms for `import app.main`")
+    parser.add_argument("--request-budget", type=float, default=400,
+                        help="median ms for the first request (except login, which includes bcrypt)")
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "TOKEN"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    workdir = tempfile.mkdtemp(prefix="linkinbio-cold-")
+    os.chdir(workdir)
+    env = {
+        **os.environ, "PYTHONPATH": ROOT, "DEBUG": "false", "STORAGE_BACKEND": "memory",
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/cold.db",
+    }
+    os.environ.update(env)
+    token = asyncio.run(seed())
+
+    failures = []
+    print(f"{'scenario':<10} {'import ms':>10} {'request ms':>11} {'total ms':>9}  status")
+    for scenario in [name.strip() for name in args.scenarios.split(",")]:
+        samples = []
+        for _ in range(args.runs):
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", scenario, token],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        import_ms = statistics.median(s["import_ms"] for s in samples)
+        request_ms = statistics.median(s["request_ms"] for s in samples)
+        statuses = sorted({s["status"] for s in samples})
+        print(f"{scenario:<10} {import_ms:>10.1f} {request_ms:>11.1f} {import_ms + request_ms:>9.1f}  {statuses}")
+
+        eager = sorted({name for s in samples for name in s["eager"]})
+        if eager:
+            failures.append(f"{scenario}: imported eagerly: {', '.join(eager)}")
+        if import_ms > args.import_budget:
+            failures.append(f"{scenario}: import {import_ms:.0f}ms > {args.import_budget:.0f}ms")
+        if scenario != "login" and request_ms > args.request_budget:
+            failures.append(f"{scenario}: first request {request_ms:.0f}ms > {args.request_budget:.0f}ms")
+        if any(status >= 500 for status in statuses):
+            failures.append(f"{scenario}: server error {statuses}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return len(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
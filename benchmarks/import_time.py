@@ -0,0 +1,70 @@
+"""
+Import-time profile of the app.
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters and
+prints the slowest modules (cumulative, median over runs) plus self time
+grouped by top-level package:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --top 30 --module app.main
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile(module: str) -> dict:
+    """{module: (self_us, cumulative_us, depth)} for one cold import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(args.runs)]
+    names = set.intersection(*(set(run) for run in runs))
+
+    def median(name, field):
+        return statistics.median(run[name][field] for run in runs)
+
+    total = median(args.module, 1)
+    print(f"import {args.module}: {total / 1000:.1f}ms (median of {args.runs})\n")
+
+    print(f"{'cumulative ms':>13} {'self ms':>8} {'%':>5}  module")
+    for name in sorted(names, key=lambda n: median(n, 1), reverse=True)[:args.top]:
+        cumulative = median(name, 1)
+        indent = "  " * runs[0][name][2]
+        print(f"{cumulative / 1000:>13.1f} {median(name, 0) / 1000:>8.1f} {100 * cumulative / total:>5.1f}  {indent}{name}")
+
+    packages = defaultdict(float)
+    for name in names:
+        packages[name.split(".")[0]] += median(name, 0)
+    print(f"\n{'self ms':>8} {'%':>5}  package")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>8.1f} {100 * self_us / total:>5.1f}  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+JSON encoding and compression cost for large profiles.
+
+Compares FastAPI's default response path (validate -> python dict ->
+json.dumps) and jsonable_encoder against pydantic-core's direct dump_json,
+then gzip/brotli size and time for the encoded body:
+
+    python benchmarks/json_encoding.py
+    LINKS=1000 python benchmarks/json_encoding.py
+"""
+import gzip
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DEBUG", "true")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.responses import adapter_for, json_bytes, compress, brotli  # noqa: E402
+from app.schemas import ProfileOut  # noqa: E402
+
+LINKS = int(os.getenv("LINKS", 200))
+ROUNDS = int(os.getenv("ROUNDS", 500))
+
+
+def make_profile():
+    return {
+        "username": "bench",
+        "bio": "Creator, runner, coffee enthusiast. ☕",
+        "avatar_url": "/media/avatars/" + "a" * 40 + "_512.webp",
+        "avatar_variants": {
+            fmt: {str(size): f"/media/avatars/{'a' * 40}_{size}.{fmt}" for size in (64, 128, 256, 512)}
+            for fmt in ("avif", "webp")
+        },
+        "links": [
+            {"id": i, "title": f"My link number {i}", "url": f"https://example.com/u/bench/{i}", "position": i}
+            for i in range(LINKS)
+        ],
+    }
+
+
+def fastapi_default(profile):
+    adapter = adapter_for(ProfileOut)
+    content = adapter.dump_python(adapter.validate_python(profile, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def encoder_path(profile):
+    content = jsonable_encoder(ProfileOut.model_validate(profile))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def direct(profile):
+    return json_bytes(ProfileOut, profile)
+
+
+def timed(fn, *args):
+    fn(*args)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn(*args)
+    return (time.perf_counter() - started) / ROUNDS, result
+
+
+def main():
+    profile = make_profile()
+    print(f"profile with {LINKS} links, {ROUNDS} rounds")
+    for label, fn in (("jsonable_encoder", encoder_path), ("fastapi default", fastapi_default), ("dump_json", direct)):
+        took, body = timed(fn, profile)
+        print(f"  {label:<18} {took * 1e6:9.1f} us  {len(body):>8} bytes")
+
+    body = direct(profile)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        took, compressed = timed(compress, body, encoding)
+        print(f"  {encoding:<18} {took * 1e6:9.1f} us  {len(compressed):>8} bytes")
+    if brotli is None:
+        print("  (pip install brotli to compare br)")
+    took, _ = timed(gzip.decompress, compress(body, "gzip"))
+    print(f"  {'gunzip':<18} {took * 1e6:9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
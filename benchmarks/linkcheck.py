@@ -0,0 +1,228 @@
+"""
+Link health checker against local stand-in sites.
+
+Starts a few threaded HTTP servers on 127.0.0.1 (one per "host"), seeds links
+to healthy, redirecting, broken, slow and title/favicon-bearing pages, then
+runs the link-check sweep job until no link is due. Verifies what was stored
+on each link, that per-host concurrency stayed within LINKCHECK_PER_HOST,
+that duplicate URLs came from the cache and that private addresses are
+refused by default. Reports throughput and exits non-zero on any failure:
+
+    python benchmarks/linkcheck.py
+    python benchmarks/linkcheck.py --hosts 8 --links 2000 --latency 0.05 --per-host 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--hosts", type=int, default=4)
+parser.add_argument("--links", type=int, default=600, help="links seeded (URLs repeat across users)")
+parser.add_argument("--latency", type=float, default=0.02, help="seconds each stand-in response takes")
+parser.add_argument("--per-host", type=int, default=2)
+parser.add_argument("--max-connections", type=int, default=20)
+parser.add_argument("--batch-size", type=int, default=100)
+ARGS = parser.parse_args()
+
+WORKDIR = tempfile.mkdtemp(prefix="linkinbio-bench-")
+os.chdir(WORKDIR)
+os.environ.setdefault("DEBUG", "true")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{WORKDIR}/linkcheck.db",
+    "LINKCHECK_ALLOW_PRIVATE": "true",
+    "LINKCHECK_TIMEOUT": "0.5",
+    "LINKCHECK_PER_HOST": str(ARGS.per_host),
+    "LINKCHECK_MAX_CONNECTIONS": str(ARGS.max_connections),
+    "LINKCHECK_BATCH_SIZE": str(ARGS.batch_size),
+})
+
+import logging  # noqa: E402
+
+logging.disable(logging.WARNING)
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import async_engine, AsyncSessionLocal, Base  # noqa: E402
+from app.linkcheck import LinkInspector, check_due_links, inspector  # noqa: E402
+
+PAGES = {
+    "/og": (200, "text/html; charset=utf-8",
+            '<html><head><title>Plain title</title><meta property="og:title" content="OG title">'
+            '<link rel="shortcut icon" href="/static/icon.png"></head><body>hi</body></html>'),
+    "/plain": (200, "text/html", "<html><head><title>  Just a\n title </title></head><body></body></html>"),
+    "/missing": (404, "text/html", "<html><head><title>Not found</title></head></html>"),
+    "/error": (503, "text/plain", "down"),
+    "/favicon.ico": (200, "image/x-icon", "ico"),
+}
+
+# path -> expected (http_status, final path, favicon path, title, error prefix)
+EXPECTED = {
+    "/og": (200, "/og", "/static/icon.png", "OG title", None),
+    "/plain": (200, "/plain", "/favicon.ico", "Just a title", None),
+    "/redirect": (200, "/og", "/static/icon.png", "OG title", None),
+    "/missing": (404, "/missing", None, None, None),  # error pages are not parsed
+    "/error": (503, "/error", None, None, None),
+    "/loop": (302, "/loop", None, None, "Too many redirects"),
+    "/slow": (None, None, None, None, "Timed out"),
+}
+
+
+class HostStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+
+
+def make_handler(stats: HostStats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with stats.lock:
+                stats.active += 1
+                stats.requests += 1
+                stats.peak = max(stats.peak, stats.active)
+            try:
+                time.sleep(ARGS.latency)
+                path = self.path.split("?")[0]
+                if path == "/slow":
+                    time.sleep(2)
+                if path in ("/redirect", "/loop"):
+                    self.send_response(302)
+                    self.send_header("Location", "/og" if path == "/redirect" else "/loop")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status, content_type, body = PAGES.get(path, (404, "text/plain", "no"))
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                with stats.lock:
+                    stats.active -= 1
+
+    return Handler
+
+
+def start_hosts(count: int):
+    hosts = []
+    for _ in range(count):
+        stats = HostStats()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stats))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        hosts.append((f"http://127.0.0.1:{server.server_address[1]}", stats, server))
+    return hosts
+
+
+async def seed(hosts):
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(models.User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, 21)
+        ])
+        paths = list(EXPECTED)
+        await conn.execute(insert(models.Link), [
+            {
+                "title": f"link {i}",
+                # Each host serves every path; the same URL recurs across users
+                "url": f"{hosts[i % len(hosts)][0]}{paths[(i // len(hosts)) % len(paths)]}",
+                "user_id": i % 20 + 1,
+                "position": i,
+            }
+            for i in range(ARGS.links)
+        ])
+
+
+def verify(link, failures):
+    base = link.url[:link.url.index("/", len("http://"))]
+    path = link.url[len(base):]
+    status, final, favicon, title, error = EXPECTED[path]
+    got = (
+        link.http_status,
+        link.final_url and link.final_url[len(base):],
+        link.favicon_url and link.favicon_url[len(base):],
+        link.og_title,
+        link.check_error,
+    )
+    if got[:4] != (status, final, favicon, title) or (error or "") not in (link.check_error or "") \
+            or (error is None and link.check_error):
+        failures.append(f"{link.url}: got {got}, expected {(status, final, favicon, title, error)}")
+
+
+async def main():
+    hosts = start_hosts(ARGS.hosts)
+    await seed(hosts)
+    failures = []
+
+    started = time.perf_counter()
+    sweeps = 0
+    while True:
+        result = await check_due_links(None)
+        sweeps += 1
+        if not result.get("backlog"):
+            break
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        links = (await db.scalars(select(models.Link))).all()
+    unchecked = [link.id for link in links if link.checked_at is None]
+    if unchecked:
+        failures.append(f"{len(unchecked)} link(s) never checked")
+    for link in links:
+        if link.checked_at is not None:
+            verify(link, failures)
+
+    distinct = ARGS.hosts * len(EXPECTED)
+    requests = sum(stats.requests for _, stats, _ in hosts)
+    peak = max(stats.peak for _, stats, _ in hosts)
+    print(f"{len(links)} links ({distinct} distinct URLs) on {ARGS.hosts} hosts in {sweeps} sweep(s): "
+          f"{elapsed:.2f}s, {len(links) / elapsed:.0f} links/s")
+    print(f"requests to stand-ins: {requests}, cache hits/misses: {inspector.hits}/{inspector.misses}, "
+          f"peak in flight per host: {peak} (limit {ARGS.per_host})")
+    if peak > ARGS.per_host:
+        failures.append(f"per-host concurrency {peak} > {ARGS.per_host}")
+    if inspector.misses > distinct:
+        failures.append(f"{inspector.misses} network checks for {distinct} distinct URLs")
+
+    # Default settings refuse loopback / private targets
+    guarded = LinkInspector(allow_private=False)
+    for url in (f"{hosts[0][0]}/og", "http://10.0.0.1/", "http://[::1]/", "ftp://example.com/"):
+        result = await guarded.inspect(url)
+        if result.error not in ("Blocked address", "Unsupported URL"):
+            failures.append(f"{url} was not refused: {result}")
+    await guarded.close()
+    await inspector.close()
+
+    for failure in failures[:20]:
+        print(f"FAIL {failure}")
+    if len(failures) > 20:
+        print(f"... and {len(failures) - 20} more")
+    for _, _, server in hosts:
+        server.shutdown()
+    return len(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
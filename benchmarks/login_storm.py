@@ -0,0 +1,103 @@
+"""
+Public profile latency during a login storm.
+
+Runs the app in-process against a throwaway SQLite database and measures
+GET /users/{username} latency alone and while concurrent logins hammer
+bcrypt. Compare the default pool against inline hashing:
+
+    python benchmarks/login_storm.py
+    PASSWORD_HASH_WORKERS=0 python benchmarks/login_storm.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="linkinbio-bench-"))
+os.environ.setdefault("DEBUG", "true")
+os.environ.setdefault("PASSWORD_HASH_QUEUE_LIMIT", "1000")
+
+import logging  # noqa: E402
+
+logging.disable(logging.INFO)
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.ratelimit import limiter  # noqa: E402
+from app.database import async_engine, Base  # noqa: E402
+from app.auth import password_hasher  # noqa: E402
+
+PROFILE_REQUESTS = int(os.getenv("PROFILE_REQUESTS", 400))
+PROFILE_CONCURRENCY = int(os.getenv("PROFILE_CONCURRENCY", 8))
+LOGINS = int(os.getenv("LOGINS", 40))
+PASSWORD = "Passw0rd!"
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def profile_load(client):
+    latencies = []
+    per_worker = PROFILE_REQUESTS // PROFILE_CONCURRENCY
+
+    async def worker():
+        for _ in range(per_worker):
+            started = time.perf_counter()
+            response = await client.get("/users/bench")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    await asyncio.gather(*(worker() for _ in range(PROFILE_CONCURRENCY)))
+    return latencies
+
+
+async def login_storm(client):
+    async def login():
+        response = await client.post("/login", json={"username": "bench", "password": PASSWORD})
+        assert response.status_code in (200, 503), response.text
+
+    await asyncio.gather(*(login() for _ in range(LOGINS)))
+
+
+def report(label, latencies):
+    print(
+        f"{label:<22} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:7.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:7.2f}ms "
+        f"mean={statistics.mean(latencies) * 1000:7.2f}ms"
+    )
+
+
+async def main():
+    limiter.enabled = False
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/register",
+            json={"username": "bench", "email": "bench@example.com", "password": PASSWORD},
+        )
+        assert response.status_code == 200, response.text
+        await client.get("/users/bench")
+
+        report("profile (idle)", await profile_load(client))
+
+        storm = asyncio.create_task(login_storm(client))
+        latencies = await profile_load(client)
+        await storm
+        report("profile (login storm)", latencies)
+
+    print(f"workers={password_hasher.workers} hasher={password_hasher.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
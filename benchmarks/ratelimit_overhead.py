@@ -0,0 +1,87 @@
+"""
+Rate limiter overhead.
+
+Times raw bucket checks per storage and public profile latency with the
+limiter on and off, in-process against a throwaway SQLite database:
+
+    python benchmarks/ratelimit_overhead.py
+    RATE_LIMIT_STORAGE_URL=redis://localhost:6379/0 python benchmarks/ratelimit_overhead.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="linkinbio-bench-"))
+os.environ.setdefault("DEBUG", "true")
+os.environ.setdefault("RATE_LIMIT_PUBLIC", "1000000/second")
+
+import logging  # noqa: E402
+
+logging.disable(logging.INFO)
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.database import async_engine, Base  # noqa: E402
+from app.ratelimit import Rate, limiter, storage_from_url  # noqa: E402
+
+CHECKS = int(os.getenv("CHECKS", 2000))
+REQUESTS = int(os.getenv("REQUESTS", 2000))
+PASSWORD = "Passw0rd!"
+
+
+async def time_storage(url):
+    storage = storage_from_url(url)
+    rate = Rate.parse("1000000/second")
+    started = time.perf_counter()
+    for i in range(CHECKS):
+        await storage.take(f"bench:ip:10.0.{i % 256}.1", rate)
+    took = (time.perf_counter() - started) / CHECKS
+    print(f"{url:<28} {took * 1e6:9.1f} us/check")
+
+
+async def time_profile(client, label):
+    latencies = []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        response = await client.get("/users/bench")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    print(
+        f"{label:<28} p50={statistics.median(latencies) * 1e6:7.1f}us "
+        f"mean={statistics.mean(latencies) * 1e6:7.1f}us"
+    )
+
+
+async def main():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    storages = ["memory", "database"]
+    if os.getenv("RATE_LIMIT_STORAGE_URL"):
+        storages.append(os.environ["RATE_LIMIT_STORAGE_URL"])
+    for url in storages:
+        await time_storage(url)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/register",
+            json={"username": "bench", "email": "bench@example.com", "password": PASSWORD},
+        )
+        assert response.status_code == 200, response.text
+        await client.get("/users/bench")
+
+        limiter.enabled = False
+        await time_profile(client, "profile (limiter off)")
+        limiter.enabled = True
+        await time_profile(client, "profile (limiter on)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
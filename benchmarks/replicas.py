@@ -0,0 +1,177 @@
+"""
+Read replica routing with SQLite files standing in for the primary and two
+replicas ("replication" is a file copy, so a replica is as stale as we want).
+
+Checks that read-only endpoints run on replicas, that writes and the writer's
+reads right after stay on the primary, that an unreachable replica fails
+over to the primary within the same request and is taken out of rotation,
+and that health checks bring it back. Exits non-zero on any failure:
+
+    python benchmarks/replicas.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="linkinbio-bench-")
+os.chdir(WORKDIR)
+PRIMARY = os.path.join(WORKDIR, "primary.db")
+REPLICAS = [os.path.join(WORKDIR, "replica0.db"), os.path.join(WORKDIR, "offline", "replica1.db")]
+STICKY_SECONDS = 0.5
+
+os.environ.setdefault("DEBUG", "true")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{PRIMARY}",
+    # replica1's directory does not exist yet: it cannot be opened
+    "DATABASE_REPLICA_URLS": ",".join(f"sqlite+aiosqlite:///{path}" for path in REPLICAS),
+    "DB_STICKY_SECONDS": str(STICKY_SECONDS),
+    # Long enough that a replica taken out stays out until check_all() below
+    "DB_REPLICA_CHECK_INTERVAL": "30",
+})
+
+import logging  # noqa: E402
+
+logging.disable(logging.WARNING)
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.ratelimit import limiter  # noqa: E402
+from app.database import Base, get_engine, replicas  # noqa: E402
+from app.cache import profile_cache, principal_cache  # noqa: E402
+
+PASSWORD = "Passw0rd!"
+
+
+def replicate(target: str) -> None:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    source, copy = sqlite3.connect(PRIMARY), sqlite3.connect(target)
+    with copy:
+        source.backup(copy)
+    source.close()
+    copy.close()
+
+
+class Statements:
+    """Statements per database, by first keyword."""
+
+    def __init__(self):
+        self.seen = {}
+
+    def watch(self, name: str, engine) -> None:
+        def record(conn, cursor, statement, parameters, context, executemany):
+            self.seen.setdefault(name, []).append(statement.split(None, 1)[0].upper())
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+
+    def take(self) -> dict:
+        seen, self.seen = self.seen, {}
+        return seen
+
+
+async def main():
+    limiter.enabled = False
+    failures = []
+
+    def expect(condition, label):
+        print(f"{'ok  ' if condition else 'FAIL'} {label}")
+        if not condition:
+            failures.append(label)
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    statements = Statements()
+    statements.watch("primary", get_engine())
+    for replica in replicas.replicas:
+        statements.watch(f"replica{replica.name}", replica.get_engine())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def read(url, **kwargs):
+            await profile_cache.backend.clear()
+            response = await client.get(url, **kwargs)
+            assert response.status_code == 200, (url, response.status_code, response.text)
+            return response.json(), statements.take()
+
+        token = (await client.post(
+            "/register", json={"username": "alice", "email": "alice@example.com", "password": PASSWORD}
+        )).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        link = (await client.post("/links", json={"title": "Blog", "url": "https://example.com"}, headers=auth)).json()
+        await client.patch("/me", data={"bio": "first"}, headers=auth)
+        wrote = statements.take()
+        expect(not any(name.startswith("replica") for name in wrote), "registration and writes ran on the primary")
+
+        replicate(REPLICAS[0])
+        await replicas.check_all()
+        expect(replicas.replicas[0].available and not replicas.replicas[1].available,
+               "health check: replica0 up, replica1 (missing file) out of rotation")
+
+        # The writer's own reads stick to the primary for DB_STICKY_SECONDS
+        # (the username -> owner lookup comes first; the rest is re-read on the primary)
+        body, seen = await read("/users/alice")
+        expect(body["bio"] == "first" and len(seen.get("primary", [])) >= 2, f"profile right after a write from the primary {seen}")
+        time.sleep(STICKY_SECONDS)
+
+        principal_cache.clear()
+        for url in ("/users/alice", "/users/alice/links", f"/links/{link['id']}"):
+            _, seen = await read(url, headers=auth)
+            # The token lookup (principal cache miss) always asks the primary
+            expect("replica0" in seen and seen.get("primary", []) in ([], ["SELECT"]), f"GET {url} read from replica0 {seen}")
+
+        # Replica lags: a new write is on the primary only
+        await client.patch("/me", data={"bio": "second"}, headers=auth)
+        await client.put(f"/links/{link['id']}", json={"title": "Journal"}, headers=auth)
+        statements.take()
+        body, seen = await read("/users/alice")
+        expect(body["bio"] == "second" and len(seen.get("primary", [])) >= 2, f"owner reads their write (sticky primary) {seen}")
+        body, seen = await read(f"/links/{link['id']}", headers=auth)
+        expect(body["title"] == "Journal" and "replica0" not in seen, "single link reads its write (sticky primary)")
+        time.sleep(STICKY_SECONDS)
+        body, seen = await read("/users/alice")
+        expect(body["bio"] == "first" and set(seen) == {"replica0"}, "after the sticky window reads go to the (stale) replica")
+        replicate(REPLICAS[0])
+        body, _ = await read("/users/alice")
+        expect(body["bio"] == "second", "replica caught up")
+
+        # Put the unreachable replica back in rotation: the request that hits it fails over
+        replicas.replicas[1].mark_up()
+        bodies, served = [], []
+        for _ in range(4):
+            body, seen = await read("/users/alice")
+            bodies.append(body["bio"])
+            served.append(sorted(seen))
+        expect(bodies == ["second"] * 4, f"every read answered during failover {served}")
+        expect(["primary"] in served and not replicas.replicas[1].available, "unreachable replica failed over and taken out")
+
+        # Recovery: the file appears, the next health check returns it to rotation
+        replicate(REPLICAS[1])
+        await replicas.check_all()
+        statements.take()
+        served = [sorted((await read("/users/alice"))[1]) for _ in range(4)]
+        expect(["replica0"] in served and ["replica1"] in served, f"both replicas share reads again {served}")
+
+        # No replica available: reads fall back to the primary
+        for replica in replicas.replicas:
+            replica.mark_down("test")
+        _, seen = await read("/users/alice")
+        expect(set(seen) == {"primary"}, "no replica available: primary serves reads")
+        for replica in replicas.replicas:
+            replica.mark_up()
+
+        metrics = (await client.get("/metrics")).text
+        for name in ("db_replica_up", "db_read_sessions_total", "db_replica_failovers_total"):
+            expect(name in metrics, f"/metrics exposes {name}")
+
+    await replicas.dispose()
+    return len(failures)
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,70 @@
+"""
+Tests run in-process against a throwaway SQLite database (app settings are
+read at import, so the environment is set here first). Everything shares one
+event loop: the engine's pooled connections belong to it.
+
+    python -m pytest -q
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="linkinbio-tests-")
+os.chdir(WORKDIR)
+os.environ.update({
+    "DEBUG": "true",
+    "DATABASE_URL": f"sqlite+aiosqlite:///{WORKDIR}/test.db",
+    "DATABASE_REPLICA_URLS": "",
+    "CACHE_URL": "memory",
+    "STORAGE_BACKEND": "memory",
+    "AVATAR_STAGING_DIR": os.path.join(WORKDIR, "uploads"),
+    # Jobs are only queued: the tests never start a worker
+    "JOB_WORKERS_ENABLED": "true",
+    "CLICK_BUFFER_ENABLED": "true",
+    "ANALYTICS_BUFFER_ENABLED": "true",
+    "METRICS_TOKEN": "",
+})
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Runs a coroutine to completion on the session's event loop."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def database(run):
+    from app import models  # noqa: F401  (registers the tables)
+    from app.crud import create_search_index
+    from app.database import Base, dispose_engine, get_engine
+
+    async def create():
+        async with get_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        # As the app's lifespan does
+        await create_search_index()
+
+    run(create())
+    yield get_engine()
+    run(dispose_engine())
+
+
+@pytest.fixture(scope="session")
+def client(run, database):
+    import httpx
+
+    from app.main import app
+    from app.ratelimit import limiter
+
+    limiter.enabled = False
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield client
+    run(client.aclose())
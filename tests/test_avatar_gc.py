@@ -0,0 +1,113 @@
+"""
+Replaced avatars are collected by a deferred job that must not delete files
+an avatar job for the same image is relying on.
+"""
+import hashlib
+from datetime import timedelta
+
+import pytest
+
+
+@pytest.fixture
+def gc(run, database):
+    from app.database import AsyncSessionLocal
+    from app.storage import content_key, get_storage
+
+    storage = get_storage()
+
+    def stored(name: str):
+        """Stores an image's files; returns (digest, avatar URL, keys)."""
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        keys = [content_key(digest, f"_{size}.webp") for size in (64, 128)]
+        for key in keys:
+            run(storage.save(key, b"image"))
+        return digest, storage.url(keys[-1]), keys
+
+    def collect(avatar_url: str, keys: list) -> dict:
+        from app import models
+        from app.jobs import enqueue
+        from app.storage import key_digest
+        from app.uploads import AVATAR_GC_JOB
+
+        async def go():
+            async with AsyncSessionLocal() as db:
+                payload = {"avatar_url": avatar_url, "digest": key_digest(keys[0]), "keys": keys}
+                # No worker runs in the tests: this runs the job here and now
+                job_id = await enqueue(db, AVATAR_GC_JOB, payload)
+                return (await db.get(models.Job, job_id)).result
+
+        return run(go())
+
+    def present(keys: list) -> list:
+        return [run(storage.exists(key)) for key in keys]
+
+    return stored, collect, present
+
+
+def test_unused_avatar_is_deleted(gc):
+    stored, collect, present = gc
+    _, url, keys = stored("unused")
+    assert collect(url, keys) == {"removed": 2}
+    assert present(keys) == [False, False]
+
+
+def test_avatar_back_in_use_is_kept(run, database, gc):
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import AsyncSessionLocal
+
+    stored, collect, present = gc
+    _, url, keys = stored("in use")
+
+    async def adopt():
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(models.User).values(
+                username="adopter", email="adopter@example.com", hashed_password="x", avatar_url=url
+            ))
+            await db.commit()
+
+    run(adopt())
+    assert collect(url, keys) == {"removed": 0}
+    assert present(keys) == [True, True]
+
+
+def test_avatar_being_stored_again_is_kept(run, database, gc):
+    from app.crud import create_job
+    from app.database import AsyncSessionLocal
+    from app.jobs import utcnow
+    from app.uploads import AVATAR_JOB
+
+    stored, collect, present = gc
+    digest, url, keys = stored("uploaded again")
+
+    async def upload():
+        # An avatar job for the same image, not due yet: it would find the files and skip storing them
+        async with AsyncSessionLocal() as db:
+            await create_job(db, AVATAR_JOB, {"staged": "-", "digest": digest}, 1, utcnow() + timedelta(days=1))
+
+    run(upload())
+    assert collect(url, keys) == {"removed": 0}
+    assert present(keys) == [True, True]
+
+
+def test_discard_defers_deletion(run, database, gc):
+    from sqlalchemy import select
+
+    from app import models
+    from app.database import AsyncSessionLocal
+    from app.uploads import AVATAR_GC_JOB, discard_avatar
+
+    stored, _, present = gc
+    _, url, keys = stored("replaced")
+
+    async def discard():
+        async with AsyncSessionLocal() as db:
+            await discard_avatar(db, 0, url, {"webp": {"64": url.replace("_128", "_64"), "128": url}})
+            return (await db.scalars(
+                select(models.Job).where(models.Job.type == AVATAR_GC_JOB, models.Job.status == "queued")
+            )).all()
+
+    [job] = [job for job in run(discard()) if job.payload["avatar_url"] == url]
+    assert sorted(job.payload["keys"]) == sorted(keys)
+    assert present(keys) == [True, True]
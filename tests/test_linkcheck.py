@@ -0,0 +1,219 @@
+"""
+Link checker behaviour against a local stand-in site: what gets stored on a
+link, private targets refused, redirect and size caps, the per-host limit and
+one fetch per distinct URL.
+"""
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.config import LINKCHECK_MAX_BYTES
+
+PAGES = {
+    "/og": (200, "text/html; charset=utf-8",
+            '<html><head><title>Plain title</title><meta property="og:title" content="OG title">'
+            '<link rel="shortcut icon" href="/static/icon.png"></head><body>hi</body></html>'),
+    "/plain": (200, "text/html", "<html><head><title>  Just a\n title </title></head><body></body></html>"),
+    "/missing": (404, "text/html", "<html><head><title>Not found</title></head></html>"),
+    "/error": (503, "text/plain", "down"),
+    # The title sits past the read cap, so it is never seen
+    "/huge": (200, "text/html",
+              "<html><head>" + "<!-- padding -->" * (LINKCHECK_MAX_BYTES // 8) + "<title>Too far</title></head></html>"),
+    "/favicon.ico": (200, "image/x-icon", "ico"),
+}
+REDIRECTS = {"/redirect": "/og", "/loop": "/loop"}
+
+
+class StandIn:
+    """Threaded HTTP server on 127.0.0.1 that counts requests and peak concurrency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                with site.lock:
+                    site.active += 1
+                    site.peak = max(site.peak, site.active)
+                    site.requests.append(path)
+                try:
+                    time.sleep(site.latency)
+                    if path in REDIRECTS:
+                        self.send_response(302)
+                        self.send_header("Location", REDIRECTS[path])
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status, content_type, body = PAGES.get(path, (404, "text/plain", "no"))
+                    data = body.encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with site.lock:
+                        site.active -= 1
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def site():
+    site = StandIn()
+    yield site
+    site.close()
+
+
+@pytest.fixture
+def inspect(run):
+    """Checks URLs with a fresh inspector that is allowed to reach 127.0.0.1."""
+    from app.linkcheck import LinkInspector
+
+    inspectors = []
+
+    def inspect(*urls, **options):
+        options.setdefault("allow_private", True)
+        options.setdefault("timeout", 2)
+        inspector = LinkInspector(**options)
+        inspectors.append(inspector)
+
+        async def check():
+            return await asyncio.gather(*(inspector.inspect(url) for url in urls))
+
+        return inspector, run(check())
+
+    yield inspect
+    for inspector in inspectors:
+        run(inspector.close())
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/og", (200, "/og", "/static/icon.png", "OG title", None)),
+    ("/plain", (200, "/plain", "/favicon.ico", "Just a title", None)),
+    ("/redirect", (200, "/og", "/static/icon.png", "OG title", None)),
+    ("/missing", (404, "/missing", None, None, None)),  # error pages are not parsed
+    ("/error", (503, "/error", None, None, None)),
+])
+def test_inspection(site, inspect, path, expected):
+    _, [result] = inspect(site.base + path)
+    strip = lambda url: url and url[len(site.base):]  # noqa: E731
+    assert (result.http_status, strip(result.final_url), strip(result.favicon_url), result.og_title,
+            result.error) == expected
+
+
+def test_private_and_non_http_urls_are_refused(site, inspect):
+    urls = [f"{site.base}/og", "http://10.0.0.1/", "http://[::1]/", "http://169.254.169.254/latest/"]
+    _, results = inspect(*urls, "ftp://example.com/", allow_private=False)
+    assert [result.error for result in results] == ["Blocked address"] * len(urls) + ["Unsupported URL"]
+    assert all(result.http_status is None for result in results)
+    assert site.requests == []
+
+
+def test_redirect_loop_is_capped(site, inspect):
+    from app.config import LINKCHECK_MAX_REDIRECTS
+
+    _, [result] = inspect(f"{site.base}/loop")
+    assert result.error == "Too many redirects"
+    assert result.http_status == 302
+    assert site.requests == ["/loop"] * (LINKCHECK_MAX_REDIRECTS + 1)
+
+
+def test_html_is_read_up_to_the_size_cap(site, inspect):
+    _, [result] = inspect(f"{site.base}/huge")
+    assert result.http_status == 200
+    assert result.error is None
+    assert result.og_title is None
+
+
+def test_per_host_limit(inspect):
+    site = StandIn(latency=0.05)
+    try:
+        inspector, results = inspect(*(f"{site.base}/plain?n={n}" for n in range(12)), per_host=2)
+    finally:
+        site.close()
+    assert all(result.error is None for result in results)
+    assert site.peak == 2
+    assert inspector.hosts == {}
+
+
+def test_duplicate_urls_share_one_fetch(site, inspect):
+    urls = [f"{site.base}/og", f"{site.base}/plain"] * 10
+    inspector, results = inspect(*urls)
+    assert (inspector.misses, inspector.hits) == (2, 18)
+    assert sorted(site.requests) == ["/favicon.ico", "/og", "/plain"]
+    assert [result.og_title for result in results] == ["OG title", "Just a title"] * 10
+
+    # ... and later checks come from the cache
+    assert inspector.results.get(f"{site.base}/og") is results[0]
+
+
+def test_sweep_stores_results(run, database, site, monkeypatch):
+    from sqlalchemy import insert, select, update
+
+    from app import models
+    from app.database import AsyncSessionLocal
+    from app.jobs import utcnow
+    from app.linkcheck import check_due_links, inspector
+
+    monkeypatch.setattr(inspector, "allow_private", True)
+    paths = ["/og", "/redirect", "/missing", "/loop"]
+
+    async def sweep():
+        async with AsyncSessionLocal() as db:
+            # Only this test's links are due
+            await db.execute(update(models.Link).values(checked_at=utcnow()))
+            user = models.User(username="swept", email="swept@example.com", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            await db.execute(insert(models.Link), [
+                {"title": path, "url": site.base + path, "user_id": user.id, "position": i}
+                for i, path in enumerate(paths)
+            ])
+            await db.commit()
+            user_id = user.id
+        while (await check_due_links(None)).get("backlog"):
+            pass
+        async with AsyncSessionLocal() as db:
+            return (await db.scalars(
+                select(models.Link).where(models.Link.user_id == user_id).order_by(models.Link.position)
+            )).all()
+
+    try:
+        links = run(sweep())
+    finally:
+        run(inspector.close())
+    assert [(link.http_status, link.og_title, link.check_error) for link in links] == [
+        (200, "OG title", None),
+        (200, "OG title", None),
+        (404, None, None),
+        (302, None, "Too many redirects"),
+    ]
+    assert all(link.checked_at is not None for link in links)
+    assert links[1].final_url == f"{site.base}/og"
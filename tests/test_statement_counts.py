@@ -0,0 +1,123 @@
+"""
+Database round trips per endpoint: each request must stay within its budget
+of SQL statements (COMMITs included), so a relationship that starts loading
+implicitly again, or a per-row query in a loop, fails here.
+"""
+import io
+
+import pytest
+from PIL import Image
+from sqlalchemy import event
+
+from app.cache import principal_cache, profile_cache
+
+PASSWORD = "Passw0rd!"
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split(None, 1)[0].upper())
+
+    def _on_commit(self, conn):
+        self.statements.append("COMMIT")
+
+    def reset(self):
+        self.statements = []
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 80, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def counter(database):
+    return StatementCounter(database)
+
+
+@pytest.fixture(scope="module")
+def state(run, client):
+    """Two users (one only to log out), links for every kind of edit, a queued job."""
+    async def setup():
+        def register(name):
+            return client.post("/register", json={"username": name, "email": f"{name}@example.com", "password": PASSWORD})
+
+        token = (await register("counted")).json()["access_token"]
+        other = (await register("leaving")).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        links = (await client.post(
+            "/links/batch", headers=auth,
+            json=[{"title": f"link {i}", "url": f"https://example.com/{i}"} for i in range(6)],
+        )).json()
+        response = await client.patch(
+            "/me", headers=auth, data={"bio": "hi"}, files={"avatar": ("a.png", png_bytes(), "image/png")}
+        )
+        assert response.status_code == 202, response.text
+        return {
+            "auth": auth,
+            "leaving": {"Authorization": f"Bearer {other}"},
+            "link": links[0]["id"],
+            "doomed": links[1]["id"],
+            "batch": [link["id"] for link in links[2:4]],
+            "batch_doomed": [link["id"] for link in links[4:6]],
+            "job": int(response.headers["location"].rsplit("/", 1)[1]),
+        }
+
+    return run(setup())
+
+
+# label, budget, method, url, request kwargs (filled from `state`), warm caches
+ENDPOINTS = [
+    ("POST /register", 3, "POST", "/register",
+     lambda s: {"json": {"username": "fresh", "email": "fresh@example.com", "password": PASSWORD}}, False),
+    ("POST /login", 1, "POST", "/login", lambda s: {"json": {"username": "counted", "password": PASSWORD}}, False),
+    ("POST /logout", 3, "POST", "/logout", lambda s: {"headers": s["leaving"]}, False),
+    ("POST /links", 4, "POST", "/links", lambda s: {"headers": s["auth"], "json": {"title": "a", "url": "https://a"}}, False),
+    ("POST /links (warm auth)", 3, "POST", "/links",
+     lambda s: {"headers": s["auth"], "json": {"title": "b", "url": "https://b"}}, True),
+    ("POST /links/batch", 4, "POST", "/links/batch",
+     lambda s: {"headers": s["auth"], "json": [{"title": f"x{i}", "url": "https://x"} for i in range(10)]}, True),
+    ("PUT /links/batch", 4, "PUT", "/links/batch",
+     lambda s: {"headers": s["auth"], "json": [{"id": i, "title": "renamed", "url": "https://y"} for i in s["batch"]]}, True),
+    ("DELETE /links/batch", 4, "DELETE", "/links/batch", lambda s: {"headers": s["auth"], "json": s["batch_doomed"]}, True),
+    ("GET /links/{id}", 2, "GET", "/links/{link}", lambda s: {"headers": s["auth"]}, False),
+    ("PUT /links/{id} (warm auth)", 3, "PUT", "/links/{link}", lambda s: {"headers": s["auth"], "json": {"title": "c"}}, True),
+    ("DELETE /links/{id} (warm auth)", 3, "DELETE", "/links/{doomed}", lambda s: {"headers": s["auth"]}, True),
+    ("GET /links", 2, "GET", "/links", lambda s: {"headers": s["auth"]}, False),
+    ("GET /links?limit=", 2, "GET", "/links?limit=5", lambda s: {"headers": s["auth"]}, False),
+    ("GET /links/{id}/clicks", 3, "GET", "/links/{link}/clicks", lambda s: {"headers": s["auth"]}, False),
+    ("GET /r/{id}", 1, "GET", "/r/{link}", lambda s: {}, False),
+    ("GET /r/{id} (warm)", 0, "GET", "/r/{link}", lambda s: {}, True),
+    ("GET /users/{username}", 3, "GET", "/users/counted", lambda s: {}, False),
+    ("GET /users/{username} (warm)", 0, "GET", "/users/counted", lambda s: {}, True),
+    ("GET /users/{username}/links", 2, "GET", "/users/counted/links", lambda s: {}, False),
+    ("GET /me", 3, "GET", "/me", lambda s: {"headers": s["auth"]}, False),
+    ("PATCH /me", 5, "PATCH", "/me", lambda s: {"headers": s["auth"], "data": {"bio": "hello"}}, False),
+    ("GET /me/stats", 2, "GET", "/me/stats", lambda s: {"headers": s["auth"]}, False),
+    ("GET /search?type=users", 1, "GET", "/search?q=counted", lambda s: {}, False),
+    ("GET /search?type=links", 1, "GET", "/search?q=link&type=links", lambda s: {}, False),
+    ("GET /jobs", 2, "GET", "/jobs", lambda s: {"headers": s["auth"]}, False),
+    ("GET /jobs/{id}", 2, "GET", "/jobs/{job}", lambda s: {"headers": s["auth"]}, False),
+    ("GET /metrics", 0, "GET", "/metrics", lambda s: {}, False),
+    ("GET /", 0, "GET", "/", lambda s: {}, False),
+]
+
+
+@pytest.mark.parametrize(
+    "label, budget, method, url, kwargs, warm", ENDPOINTS, ids=[endpoint[0] for endpoint in ENDPOINTS]
+)
+def test_statement_budget(run, client, counter, state, label, budget, method, url, kwargs, warm):
+    if not warm:
+        run(profile_cache.backend.clear())
+        principal_cache.clear()
+    counter.reset()
+    response = run(client.request(method, url.format(**state), **kwargs(state)))
+    assert response.status_code < 400, (response.status_code, response.text)
+    n = len(counter.statements)
+    assert n <= budget, f"{label}: {n} statements (budget {budget}): {' '.join(counter.statements)}"